@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+# CSV column -> metadata key for each grouping that gets its own summary documents
+GROUP_FIELDS = {
+    "County": "county",
+    "Education": "education",
+    "Gender": "gender",
+    "Age bracket": "age_bracket",
+    "Water source": "water_source",
+    "Power source": "power_source",
+}
+
+# CSV column -> (metadata key, unit) for the numeric columns summarised per group
+NUMERIC_FIELDS = {
+    "Yield": ("yield", "bushels"),
+    "Acreage": ("acreage", "acres"),
+    "Fertilizer amount": ("fertilizer_amount", "units"),
+    "Laborers": ("laborers", "laborers"),
+    "Household size": ("household_size", "people"),
+}
+
+TOP_FARMERS = 5
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _value(row, column):
+    value = row.get(column)
+    return value.strip() if value and value.strip() else "Unknown"
+
+
+def _slug(text):
+    return "".join(c if c.isalnum() else "-" for c in text.lower()).strip("-")
+
+
+# -------------------------------
+# Function: Summarise one group of rows
+# -------------------------------
+def summarize_group(rows, label):
+    """
+    Computes counts, mean/min/max of every numeric column and the top farmers by
+    yield for the rows of one group. Returns (text, stats_metadata).
+    """
+    stats = {"count": len(rows)}
+    parts = [f"Summary of {len(rows)} farmers with {label}."]
+
+    for column, (key, unit) in NUMERIC_FIELDS.items():
+        values = [v for v in (_to_float(r.get(column)) for r in rows) if v is not None]
+        if not values:
+            continue
+        mean = sum(values) / len(values)
+        stats[f"{key}_mean"] = round(mean, 2)
+        stats[f"{key}_min"] = min(values)
+        stats[f"{key}_max"] = max(values)
+        stats[f"{key}_total"] = round(sum(values), 2)
+        parts.append(
+            f"{column}: average {mean:,.2f} {unit}, min {min(values):,g}, max {max(values):,g}, "
+            f"total {sum(values):,g} ({len(values)} reported)."
+        )
+
+    ranked = sorted(
+        ((r.get("Farmer", "Unknown"), _to_float(r.get("Yield"))) for r in rows),
+        key=lambda fy: fy[1] if fy[1] is not None else float("-inf"),
+        reverse=True
+    )[:TOP_FARMERS]
+    top = [f"{farmer} ({value:g} bushels)" for farmer, value in ranked if value is not None]
+    if top:
+        stats["top_farmers"] = [farmer for farmer, value in ranked if value is not None]
+        parts.append(f"Top farmers by yield: {', '.join(top)}.")
+
+    return " ".join(parts), stats
+
+
+# -------------------------------
+# Function: Build summary documents for every group
+# -------------------------------
+def build_summary_documents(rows):
+    """
+    rows is a list of CSV row dicts. Returns (id, text, metadata) tuples: one overall
+    summary plus one per value of every GROUP_FIELDS column. The metadata carries
+    doc_type="summary" so retrieval can ask for summaries or rows explicitly.
+    """
+    documents = []
+
+    text, stats = summarize_group(rows, "any characteristics (all farms in the dataset)")
+    documents.append(("summary-all", text, {
+        "doc_type": "summary", "group_by": "all", "group_value": "all", "text": text, **stats
+    }))
+
+    for column, key in GROUP_FIELDS.items():
+        groups = defaultdict(list)
+        for row in rows:
+            groups[_value(row, column)].append(row)
+        for value, group_rows in sorted(groups.items()):
+            text, stats = summarize_group(group_rows, f"{column} = {value}")
+            documents.append((f"summary-{key}-{_slug(value)}", text, {
+                "doc_type": "summary", "group_by": key, "group_value": value, "text": text, **stats
+            }))
+    return documents
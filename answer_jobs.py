@@ -0,0 +1,128 @@
+import itertools
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+ANSWER_WORKERS = 8
+
+
+class AnswerRequest:
+    """
+    One question being answered in the background. The worker fills in the stage
+    and partial results (retrieved records, answer text so far) as they arrive;
+    the UI thread reads them with snapshot().
+    """
+
+    def __init__(self, request_id, session_id, query):
+        self.id = request_id
+        self.session_id = session_id
+        self.query = query
+        self.stage = "queued"
+        self.partial = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+        self._cancelled = threading.Event()
+        self.lock = threading.Lock()
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stop this request: drop it if still queued, otherwise stop at the next stage boundary."""
+        self._cancelled.set()
+        if self.future is not None and self.future.cancel():
+            self._finish("cancelled")
+
+    def progress(self, stage, **partial):
+        with self.lock:
+            self.stage = stage
+            self.partial.update(partial)
+
+    def _finish(self, stage, result=None, error=None):
+        with self.lock:
+            self.stage = stage
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+
+    @property
+    def done(self):
+        return self.finished_at is not None
+
+    def snapshot(self):
+        with self.lock:
+            return {"id": self.id, "stage": self.stage, "partial": dict(self.partial),
+                    "result": self.result, "error": self.error, "done": self.done,
+                    "elapsed": (self.finished_at or time.time()) - self.created_at}
+
+
+# -------------------------------
+# Background answer runner
+# -------------------------------
+class AnswerRunner:
+    """
+    Runs answer pipelines on one bounded pool shared by every session, so page
+    reruns never wait on Cohere/Pinecone and total concurrency stays capped.
+    Each session has at most one live request: submitting a new question cancels
+    the session's previous one (queued work is dropped; running work stops before
+    its next embed/query/chat call, and a streaming answer is closed). Finished
+    requests are forgotten, so callers keep the AnswerRequest submit() returns
+    for as long as they display it.
+    """
+
+    def __init__(self, max_workers=ANSWER_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="answer")
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._by_session = {}
+        self.submitted = 0
+        self.cancelled = 0
+
+    def submit(self, session_id, query, fn, *args, **kwargs):
+        """
+        Run fn(*args, cancelled=..., progress=..., **kwargs) for a session's new
+        question and return its AnswerRequest.
+        """
+        with self._lock:
+            previous = self._by_session.get(session_id)
+            request = AnswerRequest(next(self._ids), session_id, query)
+            self._by_session[session_id] = request
+            self.submitted += 1
+        if previous is not None and not previous.done:
+            previous.cancel()
+            self.cancelled += 1
+        request.future = self._pool.submit(self._run, request, fn, args, kwargs)
+        # Also fires when a queued request is cancelled and never runs
+        request.future.add_done_callback(lambda _: self._forget(request))
+        return request
+
+    def _forget(self, request):
+        with self._lock:
+            if self._by_session.get(request.session_id) is request:
+                del self._by_session[request.session_id]
+
+    def current(self, session_id):
+        """The session's queued or running request, or None."""
+        with self._lock:
+            return self._by_session.get(session_id)
+
+    def cancel(self, session_id):
+        request = self.current(session_id)
+        if request is not None and not request.done:
+            request.cancel()
+            self.cancelled += 1
+
+    def _run(self, request, fn, args, kwargs):
+        if request.cancelled():
+            request._finish("cancelled")
+            return
+        try:
+            result = fn(*args, cancelled=request.cancelled, progress=request.progress, **kwargs)
+            request._finish("done", result=result)
+        except CancelledError:
+            request._finish("cancelled")
+        except Exception as e:
+            request._finish("failed", error=e)
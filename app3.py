@@ -1,18 +1,106 @@
 import streamlit as st
 import cohere
-from pinecone import Pinecone
 import os
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from dotenv import load_dotenv
-import pandas as pd
 import pydeck as pdk
+from vector_store import open_index
+from conversation import ConversationState
+from pipeline import prepare_retrieval, run_pipeline
+from single_flight import SingleFlight, normalize_query
+import columnar_store
+from geo_index import GeoIndex, viewport_bounds
+from ingest_jobs import IngestJobRunner
+from data_versions import read_current
+from intent_router import IntentRouter
+from resilience import UpstreamError, ingest_cohere, resilient_cohere, resilient_index
+from speculation import Speculator
+from answer_jobs import AnswerRunner
 
 load_dotenv()
 
-# Initialize clients
-co = cohere.Client(os.getenv("COHERE_API_KEY"))
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index_name = os.getenv("PINECONE_INDEX_NAME")
-index = pc.Index(index_name)
+# Initialize clients once per process; calls get deadlines, hedging and a circuit breaker
+@st.cache_resource
+def get_cohere():
+    return resilient_cohere(cohere.Client(os.getenv("COHERE_API_KEY")))
+
+co = get_cohere()
+
+# Open the vector index once per process (Pinecone, or a local snapshot with VECTOR_BACKEND=local)
+@st.cache_resource
+def get_raw_index():
+    return open_index()
+
+@st.cache_resource
+def get_index():
+    return resilient_index(get_raw_index())
+
+index = get_index()
+
+# Shared by every session in this process so identical in-flight questions run once
+@st.cache_resource
+def get_single_flight():
+    return SingleFlight()
+
+# Routes questions by comparing their embedding with cached intent prototypes;
+# if the prototypes can't be embedded the keyword rules are used instead
+@st.cache_resource
+def get_intent_router():
+    try:
+        return IntentRouter.load_or_build(co)
+    except Exception:
+        return None
+
+# Bounded pool shared by every session for speculative embed/retrieve work
+@st.cache_resource
+def get_speculation_pool():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="speculate")
+
+# Bounded pool shared by every session that runs the answer pipelines in the background
+@st.cache_resource
+def get_answer_runner():
+    return AnswerRunner()
+
+# Runs uploaded CSVs through embed/upsert in the background, one job at a time. Its own
+# Cohere client (no hedging, longer deadline, separate breaker) and the unwrapped index keep
+# batch traffic out of the latencies and breakers that serve questions
+@st.cache_resource
+def get_ingest_runner():
+    return IngestJobRunner(ingest_cohere(cohere.Client(os.getenv("COHERE_API_KEY"))), get_raw_index())
+
+# The data version this run serves; a finished ingestion job switches it in one step.
+# Read once per run so every part of the page uses the same version.
+current_data = read_current()
+
+# Identifies the data behind the answers; coalesced requests must agree on it
+def get_data_version():
+    return current_data["version"]
+
+# Dashboard numbers and map points, recomputed only when the data version changes
+MAP_COLUMNS = ["County", "Crop", "Yield", "Latitude", "Longitude"]
+
+@st.cache_data
+def get_dashboard_summary(data_version):
+    return columnar_store.dashboard_summary(current_data["columnar_dir"], current_data["csv_path"])
+
+@st.cache_data
+def get_map_data(data_version):
+    return columnar_store.load_columns(MAP_COLUMNS, dataset_dir=current_data["columnar_dir"],
+                                       csv_path=current_data["csv_path"])
+
+# Spatial grids: farmer coordinates for location questions, map points for viewport queries
+@st.cache_resource
+def get_geo_index(data_version):
+    df = columnar_store.load_columns(["Farmer", "Latitude", "Longitude"], dataset_dir=current_data["columnar_dir"],
+                                     csv_path=current_data["csv_path"])
+    return GeoIndex(df["Latitude"], df["Longitude"], df["Farmer"].to_numpy())
+
+@st.cache_resource
+def get_map_geo_index(data_version):
+    df = get_map_data(data_version)
+    return GeoIndex(df["Latitude"], df["Longitude"])
 
 # Page config
 st.set_page_config(
@@ -281,12 +369,8 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
     
-    # Quick Stats
-    csv_path = "corn_data.csv"
-    df = pd.read_csv(csv_path)
-    df['Latitude'] = df['Latitude'].astype(float)
-    df['Longitude'] = df['Longitude'].astype(float)
-    df['Yield'] = df['Yield'].astype(float)
+    # Quick Stats (Parquet footers + single-column reads when available, else the CSV)
+    summary = get_dashboard_summary(get_data_version())
     
     st.markdown("""
     <div class="sidebar-section">
@@ -295,21 +379,21 @@ with st.sidebar:
     
     st.markdown(f"""
         <div class="sidebar-stat">
-            <div class="sidebar-stat-value">{df.shape[0]}</div>
+            <div class="sidebar-stat-value">{summary['rows']}</div>
             <div class="sidebar-stat-label">Total Records</div>
         </div>
     """, unsafe_allow_html=True)
     
     st.markdown(f"""
         <div class="sidebar-stat">
-            <div class="sidebar-stat-value">{df['County'].nunique()}</div>
+            <div class="sidebar-stat-value">{summary['counties']}</div>
             <div class="sidebar-stat-label">Unique Counties</div>
         </div>
     """, unsafe_allow_html=True)
     
     st.markdown(f"""
         <div class="sidebar-stat">
-            <div class="sidebar-stat-value">{df['Yield'].max():,.0f}</div>
+            <div class="sidebar-stat-value">{summary['max_yield']:,.0f}</div>
             <div class="sidebar-stat-label">Max Yield</div>
         </div>
     </div>
@@ -351,6 +435,40 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+    # Data refresh: upload a CSV and ingest it in the background; queries keep using
+    # the current version until the job switches to the new one
+    st.markdown("""
+    <div class="sidebar-section">
+        <h3>🔄 Refresh Data</h3>
+    """, unsafe_allow_html=True)
+    uploaded = st.file_uploader("Upload a CSV with the corn_data.csv columns", type="csv", key="upload_csv")
+    runner = get_ingest_runner()
+    if uploaded is not None and st.button("Start ingestion", key="ingest_btn"):
+        runner.submit(uploaded.getvalue(), uploaded.name)
+    job = runner.latest()
+    if job is not None:
+        status = job.snapshot()
+        st.progress(status["fraction"], text=f"{status['filename']}: {status['phase']} "
+                                               f"({status['done']}/{status['total']} {status['unit']})")
+        if status["throughput"]:
+            eta = f", ETA {status['eta_seconds']:.0f} s" if status["eta_seconds"] is not None else ""
+            st.caption(f"{status['throughput']:.1f} {status['unit']}/s{eta}")
+        if status["error"]:
+            st.error(status["error"])
+        elif status["phase"] == "done" and st.session_state.get("ingest_rerun_job") != status["id"]:
+            # Pick up the version the job just switched to, once per job: the pointer may
+            # since have moved elsewhere (rollback, a CLI ingestion)
+            st.session_state.ingest_rerun_job = status["id"]
+            if status["version"] != get_data_version():
+                st.rerun()
+        st.button("Refresh status", key="ingest_refresh")
+    st.caption(f"Serving data version {get_data_version()}")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    # Upstream call health: breaker state, timeouts, hedges and latency per call
+    with st.expander("🩺 Service health"):
+        st.json({"cohere": co.metrics_snapshot(), "index": index.metrics_snapshot()})
+
 # ====================== Header ======================
 st.markdown("""
 <div class="main-header">
@@ -366,7 +484,7 @@ with col1:
     st.markdown(f"""
     <div class="metric-card" style="border-top-color: #667eea;">
         <div style="font-size: 2.5rem;">👨‍🌾</div>
-        <div class="metric-value" style="color: #667eea;">{df['Farmer'].nunique()}</div>
+        <div class="metric-value" style="color: #667eea;">{summary['farmers']}</div>
         <div class="metric-label">Total Farms</div>
     </div>
     """, unsafe_allow_html=True)
@@ -375,7 +493,7 @@ with col2:
     st.markdown(f"""
     <div class="metric-card" style="border-top-color: #00d4ff;">
         <div style="font-size: 2.5rem;">🌾</div>
-        <div class="metric-value" style="color: #00d4ff;">{df['Yield'].sum():,.0f}</div>
+        <div class="metric-value" style="color: #00d4ff;">{summary['total_yield']:,.0f}</div>
         <div class="metric-label">Total Yield (bushels)</div>
     </div>
     """, unsafe_allow_html=True)
@@ -384,7 +502,7 @@ with col3:
     st.markdown(f"""
     <div class="metric-card" style="border-top-color: #f5576c;">
         <div style="font-size: 2.5rem;">📏</div>
-        <div class="metric-value" style="color: #f5576c;">{df['Acreage'].mean():.1f}</div>
+        <div class="metric-value" style="color: #f5576c;">{summary['mean_acreage']:.1f}</div>
         <div class="metric-label">Average Acreage</div>
     </div>
     """, unsafe_allow_html=True)
@@ -406,108 +524,108 @@ with col_query:
 with col_button:
     ask_button = st.button("🔍 Search", use_container_width=True, key="search_btn")
 
+# Embed and retrieve for the question as soon as it is entered, so Search only has to generate.
+# A newer question cancels the pending or running one; the key pins the data version.
+if "speculator" not in st.session_state:
+    st.session_state.speculator = Speculator(
+        get_speculation_pool(),
+        lambda q, cancelled, **kwargs: prepare_retrieval(co, index, q, cancelled=cancelled, **kwargs),
+    )
+speculator = st.session_state.speculator
+speculation_key = (get_data_version(), current_data["namespace"])
+if query and not ask_button:
+    speculator.update(query, speculation_key, geo=get_geo_index(get_data_version()),
+                      namespace=current_data["namespace"], router=get_intent_router())
+
+# Per-session conversation: previous working set + chat history for follow-up questions
+if "conversation" not in st.session_state:
+    st.session_state.conversation = ConversationState()
+conversation = st.session_state.conversation
+
+if len(conversation) and st.button(f"🧹 New conversation ({len(conversation.history)} previous questions)", key="clear_btn"):
+    conversation.clear()
+
 # ====================== AI Retrieval & Answer ======================
+# Questions run on a pool shared by all sessions so reruns never block on Cohere/Pinecone;
+# each session has one live request and searching again cancels the previous one
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+answers = get_answer_runner()
+
+def answer_question(query, chat_history, refined, geo, router, flights, cancelled, progress):
+    if refined is not None:
+        return run_pipeline(co, index, query, chat_history, refined=refined, cancelled=cancelled, progress=progress)
+    # Identical questions in flight from other sessions share one embed/query/chat run;
+    # if the session running it cancels, the others run it themselves
+    flight_key = (normalize_query(query), get_data_version(), repr(chat_history))
+    while True:
+        try:
+            result, _ = flights.do(flight_key, run_pipeline, co, index, query, chat_history,
+                                               geo=geo, namespace=current_data["namespace"], router=router,
+                                               prepared=speculator.take(query, speculation_key),
+                                               cancelled=cancelled, progress=progress)
+            return result
+        except CancelledError:
+            if cancelled():
+                raise
+
 if ask_button and query:
-    with st.spinner("🔄 Analyzing your question..."):
-        # Step 1: Embed query
-        response = co.embed(
-            texts=[query],
-            model="embed-english-v3.0",
-            input_type="search_query",
-            embedding_types=["float"]
-        )
-        query_embedding = response.embeddings.float[0]
-
-        # Step 2: Query Pinecone
-        # Retrieve all available records for comprehensive analysis
-        results = index.query(
-            vector=query_embedding,
-            top_k=1000,
-            include_metadata=True
-        )
+    # Follow-ups ("and which of those ...") are answered from the previous working set when possible
+    # Cached resources are resolved here: the worker thread has no script context
+    st.session_state.answer_request = answers.submit(
+        session_id, query, answer_question, query, conversation.chat_history(), conversation.refine(query),
+        get_geo_index(get_data_version()), get_intent_router(), get_single_flight())
 
-        # Step 3: Assemble context + Smart sorting based on query type
-        context_texts = []
-        
-        # Detect query type to determine sorting strategy
-        query_lower = query.lower()
-        yield_keywords = ['yield', 'harvest', 'production', 'bushels', 'most corn', 'highest production']
-        acreage_keywords = ['acreage', 'acres', 'land', 'farm size']
-        fertilizer_keywords = ['fertilizer', 'chemicals', 'inputs']
-        
-        is_yield_query = any(keyword in query_lower for keyword in yield_keywords)
-        is_acreage_query = any(keyword in query_lower for keyword in acreage_keywords)
-        is_fertilizer_query = any(keyword in query_lower for keyword in fertilizer_keywords)
-        
-        # Sort matches based on query type
-        if is_yield_query:
-            sorted_matches = sorted(
-                results['matches'],
-                key=lambda x: float(x['metadata'].get('yield', 0)),
-                reverse=True
-            )
-            sort_type = "yield"
-        elif is_acreage_query:
-            sorted_matches = sorted(
-                results['matches'],
-                key=lambda x: float(x['metadata'].get('acreage', 0)),
-                reverse=True
-            )
-            sort_type = "acreage"
-        elif is_fertilizer_query:
-            sorted_matches = sorted(
-                results['matches'],
-                key=lambda x: float(x['metadata'].get('fertilizer_amount', 0)),
-                reverse=True
-            )
-            sort_type = "fertilizer"
+STAGE_LABELS = {
+    "queued": "⏳ Waiting for a free worker...",
+    "retrieving": "🔄 Analyzing your question...",
+    "generating": "🤖 Writing the answer...",
+}
+
+result = None
+# The runner forgets finished requests; the session keeps its latest one to display
+request = st.session_state.get("answer_request")
+if request is not None and not request.done and st.button("⏹️ Stop", key="stop_btn"):
+    answers.cancel(session_id)
+if request is not None:
+    # Show partial results (context records, streamed answer text) until the request finishes
+    status_box = st.empty()
+    while not request.done and not request.cancelled():
+        status = request.snapshot()
+        with status_box.container():
+            st.info(f"{STAGE_LABELS.get(status['stage'], status['stage'])} ({status['elapsed']:.0f} s)")
+            partial = status["partial"]
+            if partial.get("answer_text"):
+                st.markdown(partial["answer_text"] + " ▌")
+            if "records" in partial:
+                st.caption(f"Answering from {len(partial['records'])} records")
+        time.sleep(0.25)
+    status_box.empty()
+
+    status = request.snapshot()
+    if request.cancelled():
+        st.info("⏹️ Stopped. Ask again to get an answer.")
+    elif status["stage"] == "failed":
+        error = status["error"]
+        if isinstance(error, UpstreamError):
+            # Slow or degraded upstream: fail fast instead of holding the session on the spinner
+            st.error(f"⚠️ The AI service is not responding right now ({error}). Please try again shortly.")
         else:
-            # Default: sort by semantic relevance score
-            sorted_matches = results['matches']
-            sort_type = "relevance"
-        
-        for match in sorted_matches:
-            meta = match['metadata']
-            context_texts.append(
-                f"Farmer: {meta.get('farmer', 'Unknown')}, "
-                f"County: {meta.get('county', '')}, "
-                f"Crop: {meta.get('crop', '')}, "
-                f"Yield: {meta.get('yield', '')} bushels, "
-                f"Acreage: {meta.get('acreage', '')} acres, "
-                f"Education: {meta.get('education', '')}, "
-                f"Gender: {meta.get('gender', '')}, "
-                f"Age: {meta.get('age_bracket', '')}, "
-                f"Fertilizer: {meta.get('fertilizer_amount', '')}, "
-                f"Laborers: {meta.get('laborers', '')}, "
-                f"Water Source: {meta.get('water_source', '')}, "
-                f"Power Source: {meta.get('power_source', '')}"
-            )
-        context_block = "\n".join(context_texts)
-
-        # Step 4: Generate answer
-        prompt = f"""You are an agricultural data expert. Using the following farmer data, answer the user's question accurately and comprehensively.
-
-IMPORTANT INSTRUCTIONS:
-- Always look through ALL the data provided to find complete answers
-- When asked "who has the highest/most X", identify the farmer with the maximum value
-- When asked to list farmers, provide ALL farmer names from the data that match the criteria
-- For aggregation questions (highest, most, best), compare ALL values in the data
-- ALWAYS cite specific farmer names and their values from the data
-- If comparing yields, acreage, fertilizer, or any metric - analyze across all provided records
-- Format farmer names clearly when listing multiple farmers
-
-Retrieved Farm Data (all relevant records):
-{context_block}
-
-User Question: {query}
-
-Answer:"""
-        chat_response = co.chat(
-            model="command-a-03-2025",
-            message=prompt,
-            temperature=0
-        )
-        answer_text = chat_response.text.strip()
+            st.error(f"⚠️ Something went wrong while answering: {error}")
+    else:
+        result = status["result"]
+        # Remember each answer once, however many reruns display it
+        if st.session_state.get("remembered_request") != request.id:
+            conversation.remember(request.query, result.records, result.answer_text)
+            st.session_state.remembered_request = request.id
+
+if result is not None:
+    answer_text = result.answer_text
+    records = result.records
+    sort_type = result.sort_type
+    retrieval = result.retrieval
+    map_calls = result.map_calls
 
     # ====================== Display Answer ======================
     st.markdown(f"""
@@ -516,6 +634,11 @@ Answer:"""
         <div class="answer-text">{answer_text}</div>
     </div>
     """, unsafe_allow_html=True)
+    if map_calls:
+        st.caption(f"Answer merged from {map_calls} parallel passes over {len(records)} records.")
+    elif len(records) < len(retrieval.records):
+        st.caption(f"Answered from {len(records)} of {len(retrieval.records)} retrieved records, "
+                   f"chosen for relevance and variety.")
 
     # ====================== Display Retrieved Context ======================
     st.markdown('<div class="section-header">📄 Retrieved Context</div>', unsafe_allow_html=True)
@@ -528,10 +651,28 @@ Answer:"""
         "relevance": "🎯 Top 5 Most Relevant"
     }
     sort_label = sort_labels.get(sort_type, "Top 5 Results")
-    st.markdown(f"<p style='color: #666; margin-bottom: 1rem;'>{sort_label} from {len(sorted_matches)} matching records.</p>", unsafe_allow_html=True)
-    
-    for i, match in enumerate(sorted_matches[:5], start=1):
-        meta = match['metadata']
+    # The map follows the last location question
+    st.session_state.map_focus = retrieval.location
+
+    if retrieval.location:
+        source_note = f"within {retrieval.location[2]:g} km of {retrieval.location[3]}, nearest first"
+    elif retrieval.pages:
+        source_note = f"top_k={retrieval.top_k}, {retrieval.pages} retrieval pass(es)"
+    else:
+        source_note = "refined from the previous answer's records"
+    st.markdown(f"<p style='color: #666; margin-bottom: 1rem;'>{sort_label} from {len(records)} matching records ({source_note}).</p>", unsafe_allow_html=True)
+    
+    for i in range(min(5, len(records))):
+        meta = records.metadata(i)
+        score = float(records.scores[i])
+        i += 1
+
+        # Group summaries have no per-farmer fields; show their prepared text
+        if meta.get('doc_type') == 'summary':
+            group_by = meta.get('group_by', '').replace('_', ' ').title()
+            with st.expander(f"📊 Summary — {group_by}: {meta.get('group_value', '')}", expanded=(i==1)):
+                st.markdown(meta.get('text', ''))
+            continue
         
         # Create dynamic header based on sort type
         if sort_type == "yield":
@@ -541,7 +682,7 @@ Answer:"""
         elif sort_type == "fertilizer":
             header_text = f"📍 #{i} — {meta.get('farmer', 'Unknown')} | Fertilizer: {meta.get('fertilizer_amount', 'N/A')} units"
         else:
-            header_text = f"📍 Context #{i} — Relevance Score: {match.get('score', 0):.3f}"
+            header_text = f"📍 Context #{i} — Relevance Score: {score:.3f}"
         
         with st.expander(header_text, expanded=(i==1)):
             col_a, col_b, col_c = st.columns(3)
@@ -568,18 +709,29 @@ Answer:"""
 st.markdown('<div class="section-header">🗺️ Farm Locations Map</div>', unsafe_allow_html=True)
 st.markdown("<p style='color: #666; margin-bottom: 1rem;'>Interactive map showing all farm locations. Circle size represents yield volume.</p>", unsafe_allow_html=True)
 
+map_df = get_map_data(get_data_version())
+
+# Centre on the last location question (if any) and send only the points in view
+focus = st.session_state.get("map_focus")
+if focus:
+    center_lat, center_lon, zoom = focus[0], focus[1], 10
+else:
+    center_lat, center_lon, zoom = map_df['Latitude'].mean(), map_df['Longitude'].mean(), 4
+visible = get_map_geo_index(get_data_version()).bbox(*viewport_bounds(center_lat, center_lon, zoom))
+map_points = map_df.iloc[visible]
+
 st.pydeck_chart(pdk.Deck(
     map_style=None,
     initial_view_state=pdk.ViewState(
-        latitude=df['Latitude'].mean(),
-        longitude=df['Longitude'].mean(),
-        zoom=4,
+        latitude=center_lat,
+        longitude=center_lon,
+        zoom=zoom,
         pitch=0
     ),
     layers=[
         pdk.Layer(
             'ScatterplotLayer',
-            data=df,
+            data=map_points,
             get_position='[Longitude, Latitude]',
             get_fill_color='[0, 212, 255, 200]',
             get_radius='Yield * 100',
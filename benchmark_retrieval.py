@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from diversity import select_context
+from generation import estimate_tokens, format_records
+from pipeline import embed_query
+from records import RecordSet
+from retrieval import ROW_FILTER, classify_query, retrieve
+
+FLAT_TOP_KS = [5, 10, 20, 50, 100, 200, 500, 1000]
+NUMERIC_QUESTIONS = {
+    "Yield": "yield",
+    "Acreage": "acreage",
+    "Fertilizer amount": "fertilizer usage",
+}
+
+
+# -------------------------------
+# Function: Build labeled questions from the CSV
+# -------------------------------
+def build_questions(csv_path, top_n=5, max_per_type=5, seed=0):
+    """
+    Returns question dicts with the exact set of row ids ("row-{i}") an answer must
+    see. Types: ranking (top-N by a numeric column), county, education, gender and
+    lookup (one farmer).
+    """
+    df = pd.read_csv(csv_path)
+    df["row_id"] = [f"row-{i}" for i in range(len(df))]
+    rng = np.random.default_rng(seed)
+    questions = []
+
+    for column, label in NUMERIC_QUESTIONS.items():
+        values = pd.to_numeric(df[column], errors="coerce")
+        cutoff = values.nlargest(top_n).min()
+        # Ties at the cutoff are all acceptable answers, so all count as relevant
+        relevant = df.loc[values >= cutoff, "row_id"].tolist()
+        questions.append({"type": "ranking", "question": f"Which {top_n} farmers have the highest {label}?",
+                          "relevant": relevant})
+
+    for county in df["County"].dropna().unique()[:max_per_type]:
+        questions.append({"type": "county", "question": f"List all farmers in {county.title()} county",
+                          "relevant": df.loc[df["County"] == county, "row_id"].tolist()})
+
+    for education in df["Education"].dropna().unique()[:max_per_type]:
+        questions.append({"type": "education", "question": f"List the farmers with {education} education",
+                          "relevant": df.loc[df["Education"] == education, "row_id"].tolist()})
+
+    for gender in df["Gender"].dropna().unique()[:max_per_type]:
+        questions.append({"type": "gender", "question": f"Which farmers are {gender}?",
+                          "relevant": df.loc[df["Gender"] == gender, "row_id"].tolist()})
+
+    for pos in rng.choice(len(df), size=min(max_per_type, len(df)), replace=False):
+        row = df.iloc[pos]
+        questions.append({"type": "lookup", "question": f"Tell me about farmer {row['Farmer']}",
+                          "relevant": [row["row_id"]]})
+    return questions
+
+
+def _measure(records, relevant, seconds):
+    ids = set(records.ids.tolist())
+    return {
+        "recall": len(ids & set(relevant)) / len(relevant) if relevant else 1.0,
+        "latency_ms": seconds * 1000,
+        "retrieved": len(records),
+        "prompt_tokens": estimate_tokens("\n".join(format_records(records))),
+    }
+
+
+# -------------------------------
+# Function: Run the benchmark
+# -------------------------------
+def run_benchmark(co, index, questions, top_ks=FLAT_TOP_KS, repeats=3, namespace=None):
+    """
+    For each question: flat retrieval at every top_k, plus the adaptive (flat rows)
+    and hierarchical retrieve() modes, the latter also followed by MMR context
+    selection. Returns one result dict per question/mode/top_k, with latency as
+    the median over `repeats` runs.
+    """
+    ns = {"namespace": namespace} if namespace else {}
+    results = []
+    for q in questions:
+        embedding = embed_query(co, q["question"])
+        plan = classify_query(q["question"])
+
+        runs = [("flat", k, lambda k=k: RecordSet.from_matches(index.query(
+            vector=embedding, top_k=k, include_metadata=True, filter=ROW_FILTER, **ns)['matches']))
+            for k in top_ks]
+        runs.append(("adaptive", None, lambda: retrieve(index, embedding, plan, query=q["question"],
+                                                         namespace=namespace, hierarchical=False).records))
+        runs.append(("hierarchical", None, lambda: retrieve(index, embedding, plan, query=q["question"],
+                                                             namespace=namespace).records))
+        runs.append(("hierarchical+mmr", None, lambda: select_context(
+            retrieve(index, embedding, plan, query=q["question"], namespace=namespace).records, plan.query_class)))
+
+        for mode, top_k, run in runs:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                records = run()
+                timings.append(time.perf_counter() - start)
+            result = _measure(records, q["relevant"], float(np.median(timings)))
+            result.update({"type": q["type"], "question": q["question"], "mode": mode,
+                           "top_k": top_k if top_k is not None else len(records)})
+            results.append(result)
+    return results
+
+
+def summarize(results, target_recall=0.95):
+    """Mean metrics per question type and mode/top_k, and the smallest flat top_k meeting the target."""
+    groups = defaultdict(list)
+    for r in results:
+        key = (r["type"], r["mode"], r["top_k"] if r["mode"] == "flat" else "auto")
+        groups[key].append(r)
+
+    rows = []
+    for (qtype, mode, top_k), items in sorted(groups.items(), key=lambda kv: (kv[0][0], kv[0][1], str(kv[0][2]).zfill(6))):
+        rows.append({
+            "type": qtype, "mode": mode, "top_k": top_k,
+            "recall": float(np.mean([r["recall"] for r in items])),
+            "latency_ms": float(np.mean([r["latency_ms"] for r in items])),
+            "retrieved": float(np.mean([r["retrieved"] for r in items])),
+            "prompt_tokens": float(np.mean([r["prompt_tokens"] for r in items])),
+        })
+
+    recommended = {}
+    for row in rows:
+        if row["mode"] == "flat" and row["recall"] >= target_recall:
+            current = recommended.get(row["type"])
+            if current is None or row["top_k"] < current:
+                recommended[row["type"]] = row["top_k"]
+    return rows, recommended
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency/prompt-size benchmark of retrieval modes and top_k")
+    parser.add_argument("--csv", default=None,
+                        help="ground-truth CSV (default: the served data version's CSV with --backend live, "
+                             "corn_data.csv otherwise)")
+    parser.add_argument("--backend", choices=["simulated", "live"], default="simulated",
+                        help="simulated: hashed embeddings + local index built from --csv; "
+                             "live: Cohere + the configured index (VECTOR_BACKEND / Pinecone)")
+    parser.add_argument("--top-k", default=",".join(map(str, FLAT_TOP_KS)))
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="write the per-question results to this file")
+    args = parser.parse_args()
+
+    namespace = None
+    if args.backend == "live":
+        import cohere
+        from dotenv import load_dotenv
+        from data_versions import read_current
+        from vector_store import open_index
+
+        load_dotenv()
+        co = cohere.Client(os.getenv("COHERE_API_KEY"))
+        index = open_index()
+        # The served data version: its namespace in the index and the CSV it was built from
+        current = read_current()
+        namespace = current["namespace"]
+        args.csv = args.csv or current["csv_path"]
+    else:
+        from simulated_backends import SimulatedCohere, build_simulated_index
+
+        args.csv = args.csv or "corn_data.csv"
+        co = SimulatedCohere(scale=0)
+        index = build_simulated_index(args.csv)
+
+    questions = build_questions(args.csv)
+    results = run_benchmark(co, index, questions, [int(k) for k in args.top_k.split(",")], args.repeats,
+                            namespace=namespace)
+    rows, recommended = summarize(results, args.target_recall)
+
+    print(f"{'type':<11}{'mode':<14}{'top_k':>7}{'recall':>9}{'lat ms':>9}{'rows':>8}{'tokens':>9}")
+    for row in rows:
+        print(f"{row['type']:<11}{row['mode']:<14}{str(row['top_k']):>7}{row['recall']:>9.3f}"
+              f"{row['latency_ms']:>9.2f}{row['retrieved']:>8.0f}{row['prompt_tokens']:>9.0f}")
+    print(f"\nSmallest flat top_k with recall >= {args.target_recall}:")
+    for qtype in sorted({r["type"] for r in rows}):
+        print(f"  {qtype:<11}{recommended.get(qtype, 'none of the tested values')}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "summary": rows, "recommended_top_k": recommended}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
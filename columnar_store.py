@@ -0,0 +1,178 @@
+import argparse
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; everything falls back to reading the CSV
+    pa = None
+
+CSV_PATH = "corn_data.csv"
+DATASET_DIR = "data/corn_parquet"
+PARTITION_COLUMN = "County"
+
+# Columns stored as float64 (Acreage has empty cells, which become nulls)
+NUMERIC_COLUMNS = [
+    "Household size", "Acreage", "Fertilizer amount", "Laborers", "Yield", "Latitude", "Longitude",
+]
+
+
+def available(dataset_dir=DATASET_DIR):
+    """True when pyarrow is installed and a Parquet dataset has been written."""
+    return pa is not None and os.path.isdir(dataset_dir)
+
+
+# -------------------------------
+# Function: Write the CSV as a county-partitioned Parquet dataset
+# -------------------------------
+def write_dataset(csv_path=CSV_PATH, dataset_dir=DATASET_DIR):
+    """
+    Streams the CSV into Parquet files partitioned by County (Hive layout,
+    County=<name>/part-0.parquet). Written to a temporary directory and swapped in,
+    so readers never see a half-written dataset. Returns the row count.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is not installed; run `pip install pyarrow` to write Parquet")
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        convert_options=pa_csv.ConvertOptions(column_types={c: pa.float64() for c in NUMERIC_COLUMNS}),
+    )
+    tmp_dir = dataset_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    rows = 0
+
+    def batches():
+        nonlocal rows
+        for batch in reader:
+            rows += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        batches(), tmp_dir, schema=reader.schema, format="parquet",
+        partitioning=[PARTITION_COLUMN], partitioning_flavor="hive",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+    old_dir = dataset_dir.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.isdir(dataset_dir):
+        os.rename(dataset_dir, old_dir)
+    os.rename(tmp_dir, dataset_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return rows
+
+
+def _dataset(dataset_dir):
+    return ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+
+
+def _counties_expression(counties):
+    if not counties:
+        return None
+    return ds.field(PARTITION_COLUMN).isin(list(counties))
+
+
+# -------------------------------
+# Function: Read only the needed columns / partitions
+# -------------------------------
+def load_columns(columns, counties=None, dataset_dir=DATASET_DIR, csv_path=CSV_PATH):
+    """
+    DataFrame with just `columns`, optionally restricted to some counties. With the
+    Parquet dataset only those column chunks and county partitions are read;
+    otherwise the CSV is parsed with usecols.
+    """
+    if available(dataset_dir):
+        table = _dataset(dataset_dir).to_table(columns=list(columns), filter=_counties_expression(counties))
+        return table.to_pandas()
+
+    usecols = list(columns) + ([PARTITION_COLUMN] if counties and PARTITION_COLUMN not in columns else [])
+    df = pd.read_csv(csv_path, usecols=usecols)
+    if counties:
+        df = df[df[PARTITION_COLUMN].isin(list(counties))]
+    return df[list(columns)].reset_index(drop=True)
+
+
+# -------------------------------
+# Function: Statistics from Parquet footers
+# -------------------------------
+def file_statistics(dataset_dir=DATASET_DIR):
+    """
+    Row count, partitions and per-column min/max/null counts taken from the Parquet
+    file footers, without reading any column data.
+    """
+    dataset = _dataset(dataset_dir)
+    stats = {"rows": 0, "partitions": [], "columns": {}}
+    for fragment in dataset.get_fragments():
+        partition = ds.get_partition_keys(fragment.partition_expression).get(PARTITION_COLUMN)
+        if partition is not None and partition not in stats["partitions"]:
+            stats["partitions"].append(partition)
+
+        metadata = pq.ParquetFile(fragment.path).metadata
+        stats["rows"] += metadata.num_rows
+        for rg in range(metadata.num_row_groups):
+            row_group = metadata.row_group(rg)
+            for c in range(row_group.num_columns):
+                column = row_group.column(c)
+                col_stats = column.statistics
+                if col_stats is None or not col_stats.has_min_max:
+                    continue
+                entry = stats["columns"].setdefault(
+                    column.path_in_schema, {"min": col_stats.min, "max": col_stats.max, "null_count": 0})
+                entry["min"] = min(entry["min"], col_stats.min)
+                entry["max"] = max(entry["max"], col_stats.max)
+                entry["null_count"] += col_stats.null_count or 0
+    return stats
+
+
+# -------------------------------
+# Function: Numbers shown on the dashboard
+# -------------------------------
+def dashboard_summary(dataset_dir=DATASET_DIR, csv_path=CSV_PATH):
+    """
+    Total records, unique counties, max yield (footer statistics), plus unique
+    farmers, total yield and average acreage (projected single-column reads).
+    """
+    if available(dataset_dir):
+        stats = file_statistics(dataset_dir)
+        table = _dataset(dataset_dir).to_table(columns=["Farmer", "Yield", "Acreage"])
+        return {
+            "rows": stats["rows"],
+            "counties": len(stats["partitions"]),
+            "max_yield": stats["columns"].get("Yield", {}).get("max"),
+            "farmers": pc.count_distinct(table["Farmer"]).as_py(),
+            "total_yield": pc.sum(table["Yield"]).as_py() or 0.0,
+            "mean_acreage": pc.mean(table["Acreage"]).as_py(),
+        }
+
+    df = pd.read_csv(csv_path, usecols=["County", "Farmer", "Yield", "Acreage"])
+    return {
+        "rows": len(df),
+        "counties": df["County"].nunique(),
+        "max_yield": float(df["Yield"].max()),
+        "farmers": df["Farmer"].nunique(),
+        "total_yield": float(df["Yield"].sum()),
+        "mean_acreage": float(pd.to_numeric(df["Acreage"], errors="coerce").mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write corn_data.csv as a county-partitioned Parquet dataset")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--out", default=DATASET_DIR)
+    args = parser.parse_args()
+
+    rows = write_dataset(args.csv, args.out)
+    stats = file_statistics(args.out)
+    print(f"Wrote {rows} rows to {args.out} ({len(stats['partitions'])} county partitions)")
+
+
+if __name__ == "__main__":
+    main()
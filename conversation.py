@@ -0,0 +1,104 @@
+import re
+
+from records import RecordSet
+from retrieval import combine_filters, derive_filter
+
+# A follow-up opens with its cue ("and ...", "only those ...", "which of them ..."); an
+# anaphor later in the question ("list female farmers and their yields") doesn't count
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|also|only|just|what about|how about"
+    r"|((which|who|how many|what) of |(of|among|sort|rank|order|filter|show) )?(those|these|them|they|their))\b",
+    re.IGNORECASE
+)
+
+# Words naming a numeric metadata field, for follow-ups like "those with yield above 300"
+NUMERIC_FIELD_PATTERN = (
+    r"(?P<field>yield|bushels|acre\w*|fertili[sz]er|laborers?|workers|household(?: size)?)"
+    r"\D{0,20}?"
+    r"(?P<op>above|over|more than|greater than|at least|below|under|less than|at most|>=|<=|>|<)"
+    r"\s*(?P<value>\d+(?:\.\d+)?)"
+)
+NUMERIC_FIELDS = {
+    "yield": "yield", "bushels": "yield", "acre": "acreage", "fertilizer": "fertilizer_amount",
+    "fertiliser": "fertilizer_amount", "laborer": "laborers", "worker": "laborers",
+    "household": "household_size",
+}
+OPERATORS = {
+    "above": "$gt", "over": "$gt", "more than": "$gt", "greater than": "$gt", ">": "$gt",
+    "at least": "$gte", ">=": "$gte", "below": "$lt", "under": "$lt", "less than": "$lt",
+    "<": "$lt", "at most": "$lte", "<=": "$lte",
+}
+SORT_WORDS = ['highest', 'lowest', 'most', 'least', 'top', 'best', 'worst', 'largest', 'smallest']
+
+# Number of previous turns passed to the model as chat history
+HISTORY_TURNS = 3
+
+
+def is_follow_up(query):
+    return bool(FOLLOW_UP_PATTERN.search(query))
+
+
+def numeric_filter(query):
+    """Pinecone-style filter for numeric comparisons named in the question, or None."""
+    conditions = []
+    for m in re.finditer(NUMERIC_FIELD_PATTERN, query.lower()):
+        word = m.group("field")
+        field = next(f for prefix, f in NUMERIC_FIELDS.items() if word.startswith(prefix))
+        conditions.append({field: {OPERATORS[m.group("op")]: float(m.group("value"))}})
+    return combine_filters(*conditions)
+
+
+# -------------------------------
+# Conversation state: previous working set + chat history
+# -------------------------------
+class ConversationState:
+    """
+    Per-session memory of the last retrieved working set (a columnar RecordSet) and
+    of the question/answer history, so follow-up questions can be answered by
+    refining the cached set instead of retrieving again.
+    """
+
+    def __init__(self):
+        self.records = RecordSet.empty()
+        self.history = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def remember(self, query, records, answer):
+        """Store the records the last answer was built from, plus the turn itself."""
+        self.records = records
+        self.history.append((query, answer))
+
+    def refine(self, query):
+        """
+        Answer a follow-up from the cached working set. Returns (records, filter) when
+        the question narrows or re-sorts the previous rows, or None when a new
+        retrieval is needed.
+        """
+        if not len(self.records) or not is_follow_up(query):
+            return None
+        # Only row working sets can be filtered (rows of an index built before doc_type
+        # existed carry none); summaries need a fresh retrieval
+        if self.records.distinct("doc_type") not in (["row"], []):
+            return None
+
+        metadata_filter = combine_filters(derive_filter(query, self.records), numeric_filter(query))
+        if metadata_filter is None:
+            if any(word in query.lower() for word in SORT_WORDS):
+                return self.records, None  # re-sort the same rows
+            return None
+        records = self.records.filter(metadata_filter)
+        # Nothing left in the previous set: the answer may still be in the index
+        return (records, metadata_filter) if len(records) else None
+
+    def chat_history(self):
+        """Recent turns in the shape co.chat expects for chat_history."""
+        history = []
+        for question, answer in self.history[-HISTORY_TURNS:]:
+            history.append({"role": "USER", "message": question})
+            history.append({"role": "CHATBOT", "message": answer})
+        return history
+
+    def clear(self):
+        self.__init__()
@@ -1,18 +1,32 @@
+import argparse
 import csv
+import hashlib
 import os
 import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
 import cohere
 from dotenv import load_dotenv
 from pinecone import Pinecone
 
-# Load API keys and environment variables from .env
-load_dotenv()
+import columnar_store
+import data_versions
+from aggregates import build_summary_documents
+from embedding_journal import EmbeddingJournal
+from ingest_telemetry import REPORT_DIR, IngestTelemetry, write_report
+from hierarchy import assign_groups, build_group_documents
+from upsert_writer import UpsertWriter
+
+CSV_PATH = "corn_data.csv"
+JOURNAL_DIR = ".ingest_journal"  # embedded batches are kept here until upserted
+EMBED_MODEL = "embed-english-v3.0"
+PREPARE_CHUNK_BYTES = 4 << 20  # CSV bytes parsed per worker task
 
-# Initialize clients
-co = cohere.Client(os.getenv("COHERE_API_KEY"))
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index_name = os.getenv("PINECONE_INDEX_NAME")
-index = pc.Index(index_name)
+# Batch embedding to avoid exceeding Cohere trial rate limit
+batch_size = 20   # number of rows per API call
+delay_seconds = 2  # wait time between batches to prevent 429 errors
 
 # Function to convert a row into a meaningful text block for embedding
 def row_to_text(row):
@@ -35,65 +49,258 @@ def row_to_text(row):
         f"via {get_value('Advisory format')} in {get_value('Advisory language')}."
     )
 
-# Read CSV into a list of tuples: (row_index, row_dict)
-rows = []
-with open("corn_data.csv", newline="", encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for i, row in enumerate(reader):
-        rows.append((i, row))
+# Function to build the Pinecone metadata stored alongside each row's vector
+def row_to_metadata(row):
+    return {
+        "farmer": row.get("Farmer", "Unknown"),
+        "county": row.get("County", "Unknown"),
+        "crop": row.get("Crop", "Unknown"),
+        "yield": row.get("Yield", "0"),
+        "acreage": row.get("Acreage", "0"),
+        "education": row.get("Education", "Unknown"),
+        "gender": row.get("Gender", "Unknown"),
+        "age_bracket": row.get("Age bracket", "Unknown"),
+        "household_size": row.get("Household size", "0"),
+        "fertilizer_amount": row.get("Fertilizer amount", "0"),
+        "laborers": row.get("Laborers", "0"),
+        "water_source": row.get("Water source", "Unknown"),
+        "power_source": row.get("Power source", "Unknown"),
+        "credit_source": row.get("Main credit source", "Unknown"),
+        "crop_insurance": row.get("Crop insurance", "Unknown"),
+        "farm_records": row.get("Farm records", "Unknown"),
+        "advisory_source": row.get("Main advisory source", "Unknown"),
+        "extension_provider": row.get("Extension provider", "Unknown"),
+        "advisory_format": row.get("Advisory format", "Unknown"),
+        "advisory_language": row.get("Advisory language", "Unknown"),
+        "latitude": row.get("Latitude", "0"),
+        "longitude": row.get("Longitude", "0")
+    }
 
-# Batch embedding to avoid exceeding Cohere trial rate limit
-batch_size = 20   # number of rows per API call
-delay_seconds = 2  # wait time between batches to prevent 429 errors
-vectors = []
-
-# Process in batches
-for i in range(0, len(rows), batch_size):
-    batch_rows = rows[i:i+batch_size]
-    texts = [row_to_text(r[1]) for r in batch_rows]
-
-    # Get embeddings for the batch
-    emb_batch = co.embed(
-        texts=texts,
-        model="embed-english-v3.0",
-        input_type="search_document",
-        embedding_types=["float"]
-    )
+# Fingerprint of everything that determines the journal contents; a change means start over
+def journal_fingerprint(csv_path):
+    h = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(f"{EMBED_MODEL}|{batch_size}".encode())
+    return h.hexdigest()
+
+# Split the data part of a CSV into byte ranges that start and end on line boundaries.
+# Assumes no quoted field spans lines (true for the survey exports we ingest).
+def split_byte_ranges(csv_path, chunk_bytes=PREPARE_CHUNK_BYTES):
+    with open(csv_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8")]))
+        start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        ranges = []
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # finish the line the boundary fell in
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+# Parse one byte range into (row, text, metadata) with a hash of the raw line,
+# so re-ingestion can tell changed rows apart. Runs in a worker process.
+def prepare_range(csv_path, header, start, end):
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        lines = f.read(end - start).decode("utf-8").splitlines()
+    prepared = []
+    for line, values in zip(lines, csv.reader(lines)):
+        if not values:
+            continue
+        row = dict(zip(header, values))
+        metadata = row_to_metadata(row)
+        metadata["content_hash"] = hashlib.sha256(line.encode("utf-8")).hexdigest()[:16]
+        prepared.append((row, row_to_text(row), metadata))
+    return prepared
+
+# Read and prepare the CSV: a list of (row_index, row_dict, text, metadata) in file
+# order. Byte ranges are prepared on a process pool when there is more than one;
+# callers inside a threaded server pass mp_context=get_context("spawn") so no fork happens.
+def read_rows(csv_path, workers=None, chunk_bytes=PREPARE_CHUNK_BYTES, mp_context=None):
+    header, ranges = split_byte_ranges(csv_path, chunk_bytes)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(ranges) <= 1:
+        chunks = [prepare_range(csv_path, header, start, end) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            # map() yields in submission order, so row indexes are deterministic
+            chunks = pool.map(prepare_range, repeat(csv_path), repeat(header),
+                              [r[0] for r in ranges], [r[1] for r in ranges])
+            chunks = list(chunks)
+    rows = []
+    for chunk in chunks:
+        for row, text, metadata in chunk:
+            rows.append((len(rows), row, text, metadata))
+    return rows
+
+# Turn prepared rows into (id, text, metadata) documents: one per row, the level-one
+# area documents the rows belong to, and the group summaries
+def build_documents(rows):
+    row_dicts = [row for _, row, _, _ in rows]
+    group_ids = assign_groups(row_dicts)
+    documents = [
+        (f"row-{i}", text, {"doc_type": "row", **metadata, "group_id": group_id})
+        for (i, _, text, metadata), group_id in zip(rows, group_ids)
+    ]
+    documents.extend(build_group_documents(row_dicts, group_ids))
+    documents.extend(build_summary_documents(row_dicts))
+    return documents
+
+# Embed every batch not yet in the journal; progress(done_batches, total_batches)
+# is called after each batch when given, telemetry (IngestTelemetry) records timings
+def embed_documents(co, documents, journal, progress=None, telemetry=None):
+    total_batches = ((len(documents)-1)//batch_size)+1
+    for i in range(0, len(documents), batch_size):
+        batch_no = i // batch_size
+        if journal.is_committed(batch_no):
+            print(f"Skipping batch {batch_no + 1} / {total_batches} (already in journal)")
+            if telemetry:
+                telemetry.embed_skipped += 1
+            if progress:
+                progress(batch_no + 1, total_batches)
+            continue
+
+        batch_docs = documents[i:i+batch_size]
+        texts = [d[1] for d in batch_docs]
+
+        # Get embeddings for the batch
+        start = time.perf_counter()
+        emb_batch = co.embed(
+            texts=texts,
+            model=EMBED_MODEL,
+            input_type="search_document",
+            embedding_types=["float"]
+        )
+        if telemetry:
+            telemetry.record_embed(texts, time.perf_counter() - start)
+
+        # Commit the batch to disk before moving on so a crash loses at most one batch
+        start = time.perf_counter()
+        journal.commit_batch(
+            batch_no,
+            row_offset=i,
+            ids=[d[0] for d in batch_docs],
+            embeddings=emb_batch.embeddings.float,
+            metadata=[d[2] for d in batch_docs]
+        )
+        if telemetry:
+            telemetry.add_stage("journal", time.perf_counter() - start)
+
+        print(f"Processed batch {batch_no + 1} / {total_batches}")
+        if progress:
+            progress(batch_no + 1, total_batches)
+        time.sleep(delay_seconds)  # prevent 429 Too Many Requests
+        if telemetry:
+            telemetry.add_stage("sleep", delay_seconds)
+
+# A version may only go live once the journal holds every batch of these documents;
+# a crashed run or a reset journal would otherwise replace the live data with part of it
+def check_journal_complete(journal, documents):
+    total_batches = ((len(documents)-1)//batch_size)+1 if documents else 0
+    missing = journal.missing_batches(total_batches)
+    if missing or not documents:
+        raise data_versions.ValidationError(
+            f"journal holds {total_batches - len(missing)} of {total_batches} batches "
+            f"({len(journal)} of {len(documents)} documents); run without --replay to embed the rest")
+
+# Time a stage when telemetry is on; local stages are also profiled in --profile mode
+def timed_stage(telemetry, name, local=True):
+    return telemetry.stage(name, local=local) if telemetry else nullcontext()
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed corn_data.csv with Cohere and upsert it into Pinecone")
+    parser.add_argument("--csv", default=CSV_PATH, help="CSV file to ingest")
+    parser.add_argument("--journal", default=JOURNAL_DIR, help="directory holding the embedding journal")
+    parser.add_argument("--fresh", action="store_true", help="discard the journal and embed everything again")
+    parser.add_argument("--replay", action="store_true", help="only upsert what is already in the journal")
+    parser.add_argument("--upsert-workers", type=int, default=4, help="concurrent upsert requests")
+    parser.add_argument("--prepare-workers", type=int, default=None,
+                        help="processes preparing texts/metadata (default: one per CPU)")
+    parser.add_argument("--columnar-dir", default=None,
+                        help="also write the CSV here as a county-partitioned Parquet dataset "
+                             "(default: inside the version directory)")
+    parser.add_argument("--keep-previous", action="store_true",
+                        help="don't delete the replaced version's namespace and files after switching")
+    parser.add_argument("--no-columnar", action="store_true", help="skip writing the Parquet dataset")
+    parser.add_argument("--report", action="store_true",
+                        help=f"write a telemetry report (JSON + summary) to {REPORT_DIR}/")
+    parser.add_argument("--profile", action="store_true",
+                        help="--report plus cProfile/tracemalloc of the local stages (prepares in-process)")
+    args = parser.parse_args()
+    telemetry = IngestTelemetry(args.csv, profile=args.profile) if args.report or args.profile else None
+    if args.profile:
+        args.prepare_workers = 1  # worker processes are invisible to cProfile
+
+    # Load API keys and environment variables from .env
+    load_dotenv()
+
+    # Initialize clients
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index_name = os.getenv("PINECONE_INDEX_NAME")
+    index = pc.Index(index_name)
+
+    # Every run builds its own version (namespace "v-<hash of CSV and model>") next to the live
+    # one; the app keeps serving the current version until this one is upserted and validated
+    info = data_versions.stage_version(args.csv, EMBED_MODEL)
+    if args.columnar_dir:
+        info["columnar_dir"] = args.columnar_dir
+    print(f"Building data version {info['version']} in namespace {info['namespace']}")
+
+    # Columnar copy for the dashboard and structured queries (needs pyarrow; the app falls back to the CSV)
+    if not args.no_columnar:
+        if columnar_store.pa is None:
+            print("pyarrow not installed; skipping the Parquet dataset")
+        else:
+            with timed_stage(telemetry, "columnar"):
+                rows = columnar_store.write_dataset(info["csv_path"], info["columnar_dir"])
+            print(f"Wrote {rows} rows to {info['columnar_dir']}")
+
+    with timed_stage(telemetry, "fingerprint"):
+        journal = EmbeddingJournal(args.journal, journal_fingerprint(args.csv))
+    if args.fresh:
+        journal.reset()
+
+    # Documents are built even for --replay: they say how many vectors the version must hold
+    with timed_stage(telemetry, "prepare"):
+        rows = read_rows(args.csv, args.prepare_workers)
+    with timed_stage(telemetry, "documents"):
+        documents = build_documents(rows)
+    if telemetry:
+        telemetry.rows, telemetry.documents = len(rows), len(documents)
+    if not args.replay:
+        co = cohere.Client(os.getenv("COHERE_API_KEY"))
+        embed_documents(co, documents, journal, telemetry=telemetry)
+    try:
+        check_journal_complete(journal, documents)
+    except data_versions.ValidationError as e:
+        raise SystemExit(f"Not switching to version {info['version']}: {e}")
+
+    # Upsert everything from the journal in request-sized chunks (safe to repeat: ids are stable)
+    writer = UpsertWriter(index, max_workers=args.upsert_workers, namespace=info["namespace"])
+    with timed_stage(telemetry, "upsert", local=False):
+        report = writer.write(journal.iter_vectors())
+    if telemetry:
+        telemetry.upsert = report
+    print(report)
+
+    # Switch the app over only if the new namespace is complete and finds sampled rows
+    with timed_stage(telemetry, "validate", local=False):
+        check = data_versions.validate_version(index, info["namespace"], len(documents),
+                                               data_versions.sample_vectors(journal))
+    print(f"Validated {check['count']} vectors, sample recall {check['recall']:.0%}")
+    previous = data_versions.promote(info)
+    print(f"CSV data successfully ingested into Pinecone; serving version {info['version']}")
+
+    if previous is not None and not args.keep_previous:
+        print(f"Retiring version {previous['version']} in {data_versions.RETIRE_GRACE_SECONDS} s")
+        data_versions.retire_version(index, previous)
+
+    if telemetry:
+        write_report(telemetry.report())
 
-    # Add each embedding to vectors list
-    for j, r in enumerate(batch_rows):
-        vectors.append({
-            "id": f"row-{r[0]}",
-            "values": emb_batch.embeddings.float[j],
-            "metadata": {
-                "farmer": r[1].get("Farmer", "Unknown"),
-                "county": r[1].get("County", "Unknown"),
-                "crop": r[1].get("Crop", "Unknown"),
-                "yield": r[1].get("Yield", "0"),
-                "acreage": r[1].get("Acreage", "0"),
-                "education": r[1].get("Education", "Unknown"),
-                "gender": r[1].get("Gender", "Unknown"),
-                "age_bracket": r[1].get("Age bracket", "Unknown"),
-                "household_size": r[1].get("Household size", "0"),
-                "fertilizer_amount": r[1].get("Fertilizer amount", "0"),
-                "laborers": r[1].get("Laborers", "0"),
-                "water_source": r[1].get("Water source", "Unknown"),
-                "power_source": r[1].get("Power source", "Unknown"),
-                "credit_source": r[1].get("Main credit source", "Unknown"),
-                "crop_insurance": r[1].get("Crop insurance", "Unknown"),
-                "farm_records": r[1].get("Farm records", "Unknown"),
-                "advisory_source": r[1].get("Main advisory source", "Unknown"),
-                "extension_provider": r[1].get("Extension provider", "Unknown"),
-                "advisory_format": r[1].get("Advisory format", "Unknown"),
-                "advisory_language": r[1].get("Advisory language", "Unknown"),
-                "latitude": r[1].get("Latitude", "0"),
-                "longitude": r[1].get("Longitude", "0")
-            }
-        })
-
-    print(f"Processed batch {i // batch_size + 1} / {((len(rows)-1)//batch_size)+1}")
-    time.sleep(delay_seconds)  # prevent 429 Too Many Requests
-
-# Upsert all vectors at once
-index.upsert(vectors=vectors)
-print("CSV data successfully ingested into Pinecone")
+if __name__ == "__main__":
+    main()
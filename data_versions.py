@@ -0,0 +1,237 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import time
+
+import columnar_store
+
+VERSIONS_DIR = "data/versions"
+CURRENT_POINTER = "data/current.json"  # which data version the app serves
+LEGACY_CSV = "corn_data.csv"
+# A retired version stays queryable this long, so questions that read the old pointer can finish
+RETIRE_GRACE_SECONDS = 30
+VALIDATION_SAMPLES = 20
+MIN_SAMPLE_RECALL = 0.95
+COUNT_WAIT_SECONDS = 60  # Pinecone's vector counts lag freshly upserted data
+
+
+class ValidationError(RuntimeError):
+    """A built version doesn't match what was ingested; the pointer is left alone."""
+
+
+# -------------------------------
+# Data version pointer
+# -------------------------------
+def read_current(pointer_path=CURRENT_POINTER):
+    """
+    The data version the app should serve: {"version", "csv_path", "columnar_dir",
+    "namespace"}. Before any versioned ingestion exists this describes corn_data.csv
+    in the index's default namespace, versioned by the file's mtime and size.
+    """
+    try:
+        with open(pointer_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        stat = os.stat(LEGACY_CSV)
+        return {
+            "version": f"{stat.st_mtime_ns}-{stat.st_size}",
+            "csv_path": LEGACY_CSV,
+            "columnar_dir": columnar_store.DATASET_DIR,
+            "namespace": None,
+        }
+
+
+def switch_current(info, pointer_path=CURRENT_POINTER):
+    """Point the app at another data version; readers see the old or the new file, never a mix."""
+    os.makedirs(os.path.dirname(pointer_path) or ".", exist_ok=True)
+    tmp_path = pointer_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, pointer_path)
+
+
+def promote(info, pointer_path=CURRENT_POINTER):
+    """
+    Switch to a validated version, remembering the one it replaces (for rollback
+    and garbage collection). Returns the replaced version, or None if it was
+    already current.
+    """
+    previous = read_current(pointer_path)
+    if previous.get("version") == info["version"]:
+        return None
+    previous.pop("previous", None)
+    switch_current(dict(info, previous=previous), pointer_path)
+    return previous
+
+
+# -------------------------------
+# Building a version
+# -------------------------------
+def content_version(blocks, model):
+    """
+    Version id of CSV content (an iterable of byte blocks) embedded with a model;
+    the same data and model always build the same version, a model change a new one.
+    """
+    h = hashlib.sha256()
+    for block in blocks:
+        h.update(block)
+    h.update(model.encode())
+    return h.hexdigest()[:12]
+
+
+def file_version(csv_path, model):
+    with open(csv_path, "rb") as f:
+        return content_version(iter(lambda: f.read(1 << 20), b""), model)
+
+
+def stage_version(csv_path, model, versions_dir=VERSIONS_DIR):
+    """
+    Copies the CSV into its own version directory so later edits to the source
+    can't change what a live version serves. Returns the pointer info to promote.
+    """
+    info = version_info(file_version(csv_path, model), versions_dir)
+    staged = info["csv_path"]
+    os.makedirs(os.path.dirname(staged), exist_ok=True)
+    if not os.path.exists(staged):
+        shutil.copyfile(csv_path, staged + ".tmp")
+        os.replace(staged + ".tmp", staged)
+    return info
+
+
+def version_info(version, versions_dir=VERSIONS_DIR):
+    version_dir = os.path.join(versions_dir, version)
+    return {
+        "version": version,
+        "csv_path": os.path.join(version_dir, "data.csv"),
+        "columnar_dir": os.path.join(version_dir, "parquet"),  # absent without pyarrow; readers fall back to the CSV
+        "namespace": f"v-{version}",
+    }
+
+
+def _with_retries(fn, attempts=4, backoff_seconds=1.0):
+    """Validation calls are cheap reads; a throttled or failed one is retried with backoff."""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(backoff_seconds * 2 ** attempt)
+
+
+def _namespace_count(index, namespace):
+    stats = _with_retries(index.describe_index_stats)
+    return stats["namespaces"].get(namespace or "", {}).get("vector_count", 0)
+
+
+# -------------------------------
+# Function: Validate a built version before it goes live
+# -------------------------------
+def validate_version(index, namespace, expected_count, samples, top_k=10,
+                     min_recall=MIN_SAMPLE_RECALL, wait_seconds=COUNT_WAIT_SECONDS):
+    """
+    Checks the namespace holds exactly expected_count vectors (waiting for the
+    index's counts to catch up) and that querying with sampled (id, vector) pairs
+    finds each id in its own top_k. Returns {"count", "recall"}; raises
+    ValidationError otherwise, and when there is nothing to check (no vectors
+    expected or no samples).
+    """
+    # An empty build (e.g. a reset journal) must never replace a live version
+    if expected_count <= 0 or not samples:
+        raise ValidationError(f"nothing to validate in namespace {namespace!r}: "
+                              f"{expected_count} vectors expected, {len(samples)} samples")
+    deadline = time.monotonic() + wait_seconds
+    count = _namespace_count(index, namespace)
+    while count != expected_count and time.monotonic() < deadline:
+        time.sleep(2)
+        count = _namespace_count(index, namespace)
+    if count != expected_count:
+        raise ValidationError(f"namespace {namespace!r} holds {count} vectors, expected {expected_count}")
+
+    found = 0
+    for vec_id, values in samples:
+        matches = _with_retries(lambda: index.query(vector=values, top_k=top_k, namespace=namespace))["matches"]
+        found += any(m["id"] == vec_id for m in matches)
+    recall = found / len(samples)
+    if recall < min_recall:
+        raise ValidationError(f"sample recall {recall:.0%} in namespace {namespace!r} is below {min_recall:.0%}")
+    return {"count": count, "recall": recall}
+
+
+def sample_vectors(journal, k=VALIDATION_SAMPLES, seed=0):
+    """Reservoir sample of (id, values) pairs from an embedding journal."""
+    rng = random.Random(seed)
+    sample = []
+    for n, vector in enumerate(journal.iter_vectors()):
+        if n < k:
+            sample.append((vector["id"], vector["values"]))
+        else:
+            j = rng.randrange(n + 1)
+            if j < k:
+                sample[j] = (vector["id"], vector["values"])
+    return sample
+
+
+# -------------------------------
+# Function: Garbage-collect a replaced version
+# -------------------------------
+def retire_version(index, info, versions_dir=VERSIONS_DIR, grace_seconds=RETIRE_GRACE_SECONDS,
+                   pointer_path=CURRENT_POINTER):
+    """
+    Deletes a replaced version's vectors (its whole namespace; the default
+    namespace for the pre-versioning data) and its files under versions_dir,
+    after grace_seconds so in-flight questions can finish. Nothing is deleted if
+    the version was rolled back to in the meantime; corn_data.csv and other files
+    outside versions_dir are never touched.
+    """
+    time.sleep(grace_seconds)
+    if read_current(pointer_path)["version"] == info["version"]:
+        return False
+    index.delete(delete_all=True, namespace=info.get("namespace") or "")
+    version_dir = os.path.join(versions_dir, info["version"])
+    if os.path.isdir(version_dir):
+        shutil.rmtree(version_dir)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, roll back or clean up data versions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("show", help="print the current pointer")
+    sub.add_parser("rollback", help="point back at the previous version if it hasn't been retired")
+    gc = sub.add_parser("gc", help="delete the namespaces and files of every version but the current one "
+                                   "(don't run while an ingestion is building a new version)")
+    gc.add_argument("--grace", type=float, default=0, help="seconds to wait before deleting")
+    args = parser.parse_args()
+
+    current = read_current()
+    if args.command == "show":
+        print(json.dumps(current, indent=2))
+        return
+
+    from dotenv import load_dotenv
+    from vector_store import open_index
+
+    load_dotenv()
+    index = open_index()
+    if args.command == "rollback":
+        previous = current.get("previous")
+        if not previous or _namespace_count(index, previous.get("namespace")) == 0:
+            raise SystemExit("No previous version to roll back to")
+        promote(previous)
+        print(f"Now serving {previous['version']}")
+    else:
+        namespaces = index.describe_index_stats()["namespaces"]
+        for name in namespaces:
+            if name.startswith("v-") and name != current["namespace"]:
+                if retire_version(index, {"version": name[2:], "namespace": name}, grace_seconds=args.grace):
+                    print(f"Retired {name}")
+
+
+if __name__ == "__main__":
+    main()
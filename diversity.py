@@ -0,0 +1,90 @@
+import numpy as np
+
+from generation import estimate_tokens, format_records
+from records import NUMERIC_FIELDS
+from retrieval import FILTER_FIELDS, PATH_BY_CLASS
+
+# Prompt tokens the context of a similarity (RAG path) question may use, about 25 rows
+CONTEXT_TOKEN_BUDGET = 1500
+# Weight of relevance against novelty in the MMR score (1.0 = plain relevance order)
+MMR_LAMBDA = 0.7
+# Coordinates make near neighbours look different without telling the model anything new
+SIMILARITY_NUMERIC_FIELDS = [f for f in NUMERIC_FIELDS if f not in ("latitude", "longitude")]
+
+
+def _similarity_columns(records):
+    """Per-field arrays for Gower similarity: categorical codes and range-scaled numbers."""
+    categorical = [records.categorical[f].codes for f in FILTER_FIELDS if f in records.categorical]
+    numeric = []
+    for field in SIMILARITY_NUMERIC_FIELDS:
+        values = records.numeric.get(field)
+        if values is None or np.isnan(values).all():
+            continue
+        low, high = np.nanmin(values), np.nanmax(values)
+        numeric.append((values - low) / (high - low) if high > low else np.zeros_like(values))
+    return categorical, numeric
+
+
+def gower_similarity(categorical, numeric, i):
+    """
+    Similarity in [0, 1] of record i to every record: the share of categorical
+    fields with the same value plus 1 - |difference| on each range-scaled number.
+    Missing values count as dissimilar.
+    """
+    n = len(categorical[0]) if categorical else len(numeric[0])
+    total = np.zeros(n)
+    for codes in categorical:
+        total += (codes == codes[i]) & (codes >= 0)
+    for values in numeric:
+        total += np.nan_to_num(1.0 - np.abs(values - values[i]), nan=0.0)
+    return total / max(len(categorical) + len(numeric), 1)
+
+
+# -------------------------------
+# Function: Maximal marginal relevance selection
+# -------------------------------
+def mmr_select(records, token_costs, budget=CONTEXT_TOKEN_BUDGET, lambda_=MMR_LAMBDA):
+    """
+    Greedy MMR over a RecordSet: repeatedly takes the record maximising
+    lambda * relevance - (1 - lambda) * (highest similarity to a record already
+    taken), skipping records that no longer fit the token budget. Relevance is the
+    index score scaled to [0, 1]; similarity is Gower similarity of the metadata.
+    Returns the chosen positions in selection order.
+    """
+    n = len(records)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+    scores = records.scores.astype(np.float64)
+    spread = scores.max() - scores.min()
+    relevance = (scores - scores.min()) / spread if spread > 0 else np.ones(n)
+    categorical, numeric = _similarity_columns(records)
+    costs = np.asarray(token_costs)
+
+    max_similarity = np.zeros(n)
+    available = costs <= budget
+    selected, remaining = [], budget
+    while available.any():
+        mmr = np.where(available, lambda_ * relevance - (1 - lambda_) * max_similarity, -np.inf)
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        remaining -= costs[best]
+        available[best] = False
+        available &= costs <= remaining
+        if categorical or numeric:
+            np.maximum(max_similarity, gower_similarity(categorical, numeric, best), out=max_similarity)
+    return np.asarray(selected, dtype=np.intp)
+
+
+def select_context(records, query_class, budget=CONTEXT_TOKEN_BUDGET, lambda_=MMR_LAMBDA):
+    """
+    Diverse, budget-bounded subset of the rows retrieved for a similarity (RAG
+    path) question, kept in relevance order. Structured questions (rankings,
+    listings, aggregates) need every matching record and are returned unchanged,
+    as are results that already fit the budget.
+    """
+    if PATH_BY_CLASS.get(query_class) != "rag" or not len(records):
+        return records
+    costs = [estimate_tokens(line) + 1 for line in format_records(records)]  # +1 for the newline
+    if sum(costs) <= budget:
+        return records
+    return records.take(np.sort(mmr_select(records, costs, budget, lambda_)))
@@ -0,0 +1,110 @@
+import json
+import os
+
+import numpy as np
+
+
+# -------------------------------
+# Embedding journal: durable record of embedded batches
+# -------------------------------
+class EmbeddingJournal:
+    """
+    Stores every embedded batch on disk as it is produced so that ingestion can
+    resume after a crash and upserts can be replayed without calling Cohere again.
+
+    Layout of the journal directory:
+        manifest.json       source fingerprint + committed batches (ids, row offsets)
+        batch-00000.npy     float32 embeddings for batch 0
+        batch-00000.json    metadata for batch 0, in the same order as the ids
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        os.makedirs(self.path, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+        # A journal written for another CSV / model / batch size cannot be resumed
+        if self.manifest.get("fingerprint") != fingerprint:
+            self.reset()
+
+    def _load_manifest(self):
+        manifest_path = os.path.join(self.path, self.MANIFEST)
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_manifest(self):
+        # Write to a temp file and rename so a crash never leaves a half-written manifest
+        manifest_path = os.path.join(self.path, self.MANIFEST)
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, manifest_path)
+
+    def reset(self):
+        """Forget every committed batch and delete the batch files."""
+        for name in os.listdir(self.path):
+            if name.startswith("batch-"):
+                os.remove(os.path.join(self.path, name))
+        self.manifest = {"fingerprint": self.fingerprint, "batches": {}}
+        self._write_manifest()
+
+    def is_committed(self, batch_no):
+        return str(batch_no) in self.manifest["batches"]
+
+    def committed_batches(self):
+        return sorted(int(b) for b in self.manifest["batches"])
+
+    def missing_batches(self, total_batches):
+        """Batch numbers below total_batches that haven't been committed."""
+        return [b for b in range(total_batches) if not self.is_committed(b)]
+
+    def commit_batch(self, batch_no, row_offset, ids, embeddings, metadata):
+        """
+        Persist one embedded batch. The batch only counts as committed once the
+        manifest has been rewritten, so a crash mid-write simply redoes the batch.
+        """
+        stem = f"batch-{batch_no:05d}"
+        vectors_file = stem + ".npy"
+        metadata_file = stem + ".json"
+
+        with open(os.path.join(self.path, vectors_file), "wb") as f:
+            np.save(f, np.asarray(embeddings, dtype=np.float32))
+            f.flush()
+            os.fsync(f.fileno())
+        with open(os.path.join(self.path, metadata_file), "w", encoding="utf-8") as f:
+            json.dump(metadata, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.manifest["batches"][str(batch_no)] = {
+            "row_offset": row_offset,
+            "ids": list(ids),
+            "vectors_file": vectors_file,
+            "metadata_file": metadata_file,
+        }
+        self._write_manifest()
+
+    def iter_batches(self):
+        """Yield (ids, embeddings, metadata) for each committed batch in order."""
+        for batch_no in self.committed_batches():
+            entry = self.manifest["batches"][str(batch_no)]
+            embeddings = np.load(os.path.join(self.path, entry["vectors_file"]))
+            with open(os.path.join(self.path, entry["metadata_file"]), encoding="utf-8") as f:
+                metadata = json.load(f)
+            yield entry["ids"], embeddings, metadata
+
+    def iter_vectors(self):
+        """Yield Pinecone-style vector dicts for everything in the journal."""
+        for ids, embeddings, metadata in self.iter_batches():
+            for vec_id, values, meta in zip(ids, embeddings, metadata):
+                yield {"id": vec_id, "values": values.tolist(), "metadata": meta}
+
+    def __len__(self):
+        return sum(len(b["ids"]) for b in self.manifest["batches"].values())
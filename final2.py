@@ -1,18 +1,18 @@
 import os
 import cohere
-from pinecone import Pinecone
 from dotenv import load_dotenv
+from vector_store import open_index
+from resilience import resilient_cohere, resilient_index
+from data_versions import read_current
 
 # Load API keys from .env
 load_dotenv()
 
 # Initialize Cohere client for embeddings and generation
-co = cohere.Client(os.getenv("COHERE_API_KEY"))
+co = resilient_cohere(cohere.Client(os.getenv("COHERE_API_KEY")))
 
-# Initialize Pinecone client and connect to your index
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
-index_name = os.getenv("PINECONE_INDEX_NAME")  # make sure this matches your .env
-index = pc.Index(index_name)
+# Connect to the Pinecone index named in .env (or a local snapshot with VECTOR_BACKEND=local)
+index = resilient_index(open_index())
 
 # -------------------------------
 # Function: Retrieve vectors from Pinecone
@@ -30,11 +30,12 @@ def retrieve_vectors(query, top_k=5):
     )
     query_embedding = response.embeddings.float[0]
 
-    # Query Pinecone index
+    # Query the namespace of the data version currently being served
     results = index.query(
         vector=query_embedding,
         top_k=top_k,
-        include_metadata=True
+        include_metadata=True,
+        namespace=read_current()["namespace"]
     )
 
     return results['matches']
@@ -49,6 +50,10 @@ def build_prompt(query, matches):
     context_texts = []
     for m in matches:
         metadata = m['metadata']
+        # Summary and area documents share the namespace with the rows and carry their own text
+        if metadata.get('doc_type') in ('summary', 'group'):
+            context_texts.append(metadata.get('text', ''))
+            continue
         context_texts.append(
             f"County: {metadata.get('county','N/A')}, "
             f"Crop: {metadata.get('crop','N/A')}, "
@@ -0,0 +1,245 @@
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import numpy as np
+
+CHAT_MODEL = "command-a-03-2025"
+
+# Above this many context tokens a single prompt gets unreliable, so switch to map-reduce
+MAX_SINGLE_PROMPT_TOKENS = 30000
+MAP_CHUNK_TOKENS = 8000
+# Chat calls per minute across the whole process for map-reduce answers (the trial key limit)
+CHAT_CALLS_PER_MINUTE = 20
+
+
+# (label, metadata field, default, unit) of each value in a record's context line
+RECORD_FIELDS = [
+    ("Farmer", "farmer", "Unknown", ""),
+    ("County", "county", "", ""),
+    ("Crop", "crop", "", ""),
+    ("Yield", "yield", "", " bushels"),
+    ("Acreage", "acreage", "", " acres"),
+    ("Education", "education", "", ""),
+    ("Gender", "gender", "", ""),
+    ("Age", "age_bracket", "", ""),
+    ("Fertilizer", "fertilizer_amount", "", ""),
+    ("Laborers", "laborers", "", ""),
+    ("Water Source", "water_source", "", ""),
+    ("Power Source", "power_source", "", ""),
+]
+
+
+# -------------------------------
+# Function: Format retrieved records for the prompt
+# -------------------------------
+def format_records(records):
+    """
+    One context line per record of a RecordSet, built a column at a time with
+    numpy string operations. Summary documents contribute their prepared text.
+    """
+    if not len(records):
+        return []
+    lines = None
+    for label, field, default, unit in RECORD_FIELDS:
+        part = np.char.add(np.char.add(f"{label}: ", records.column(field, default).astype(str)), unit)
+        lines = part if lines is None else np.char.add(np.char.add(lines, ", "), part)
+
+    is_summary = records.column("doc_type") == "summary"
+    if is_summary.any():
+        lines = np.where(is_summary, records.column("text", "").astype(str), lines)
+    return lines.tolist()
+
+
+def build_prompt(query, context_block):
+    return f"""You are an agricultural data expert. Using the following farmer data, answer the user's question accurately and comprehensively.
+
+IMPORTANT INSTRUCTIONS:
+- Always look through ALL the data provided to find complete answers
+- When asked "who has the highest/most X", identify the farmer with the maximum value
+- When asked to list farmers, provide ALL farmer names from the data that match the criteria
+- For aggregation questions (highest, most, best), compare ALL values in the data
+- ALWAYS cite specific farmer names and their values from the data
+- If comparing yields, acreage, fertilizer, or any metric - analyze across all provided records
+- Format farmer names clearly when listing multiple farmers
+- Entries starting with "Summary of" are precomputed group statistics - use their counts, averages and totals directly
+
+Retrieved Farm Data (all relevant records):
+{context_block}
+
+User Question: {query}
+
+Answer:"""
+
+
+def build_map_prompt(query, context_block, part, parts):
+    return f"""You are an agricultural data expert. Below is part {part} of {parts} of the farmer records relevant to a question.
+Using ONLY these records, extract everything needed to answer the question: matching farmer names with their values,
+the maximum/minimum values and who holds them, and counts and sums (not averages) for any aggregates.
+Be concise and factual; another step will combine your notes with the other parts.
+
+Farmer Records (part {part} of {parts}):
+{context_block}
+
+User Question: {query}
+
+Notes for this part:"""
+
+
+def build_reduce_prompt(query, partial_answers):
+    notes = "\n\n".join(f"--- Notes from part {i} ---\n{text}" for i, text in enumerate(partial_answers, start=1))
+    return f"""You are an agricultural data expert. The farmer records for a question were split into {len(partial_answers)} parts
+and each part was analysed separately. Combine the notes below into one complete answer to the user's question.
+
+IMPORTANT INSTRUCTIONS:
+- Compare values across ALL parts when asked for the highest/lowest/most
+- Combine counts and sums from every part before computing totals or averages
+- When asked to list farmers, include matching farmers from ALL parts
+- ALWAYS cite specific farmer names and their values
+
+{notes}
+
+User Question: {query}
+
+Answer:"""
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def chunk_lines(lines, max_tokens=MAP_CHUNK_TOKENS):
+    """Split context lines into consecutive chunks of at most max_tokens each."""
+    chunks, chunk, chunk_tokens = [], [], 0
+    for line in lines:
+        tokens = estimate_tokens(line)
+        if chunk and chunk_tokens + tokens > max_tokens:
+            chunks.append(chunk)
+            chunk, chunk_tokens = [], 0
+        chunk.append(line)
+        chunk_tokens += tokens
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class RateLimiter:
+    """Spaces calls evenly so that no more than calls_per_minute start in any minute."""
+
+    def __init__(self, calls_per_minute):
+        self.interval = 60.0 / calls_per_minute
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def shared_rate_limiter(calls_per_minute=CHAT_CALLS_PER_MINUTE):
+    """
+    The process-wide RateLimiter for a rate, so concurrent answers (every session's
+    map-reduce fan-out) share one budget instead of each getting its own.
+    """
+    with _rate_limiters_lock:
+        if calls_per_minute not in _rate_limiters:
+            _rate_limiters[calls_per_minute] = RateLimiter(calls_per_minute)
+        return _rate_limiters[calls_per_minute]
+
+
+def chat(co, prompt, rate_limiter=None, chat_history=None):
+    if rate_limiter:
+        rate_limiter.wait()
+    kwargs = {"chat_history": chat_history} if chat_history else {}
+    response = co.chat(
+        model=CHAT_MODEL,
+        message=prompt,
+        temperature=0,
+        **kwargs
+    )
+    return response.text.strip()
+
+
+def chat_streamed(co, prompt, on_text, cancelled=None, chat_history=None):
+    """
+    Like chat, but streams: on_text gets the answer so far after every chunk.
+    Closing the stream when cancelled() turns true stops the generation, raising
+    CancelledError.
+    """
+    kwargs = {"chat_history": chat_history} if chat_history else {}
+    stream = co.chat_stream(model=CHAT_MODEL, message=prompt, temperature=0, **kwargs)
+    text = ""
+    try:
+        for event in stream:
+            if cancelled and cancelled():
+                raise CancelledError()
+            if event.event_type == "text-generation":
+                text += event.text
+                on_text(text)
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return text.strip()
+
+
+# -------------------------------
+# Function: Generate an answer, map-reducing large contexts
+# -------------------------------
+def generate_answer(co, query, context_lines, max_single_prompt_tokens=MAX_SINGLE_PROMPT_TOKENS,
+                    chunk_tokens=MAP_CHUNK_TOKENS, map_workers=4, calls_per_minute=CHAT_CALLS_PER_MINUTE, chat_history=None,
+                    cancelled=None, on_text=None):
+    """
+    Answers from one prompt when the records fit; otherwise splits them into
+    token-bounded chunks, runs the per-chunk (map) chat calls concurrently under the
+    process-wide rate limit and merges their notes with a final reduce call. chat_history (previous
+    turns of the conversation) is only sent with the call that writes the answer.
+    With on_text, a single-prompt answer is streamed to it as it is written (when
+    the client supports chat_stream). Once cancelled() turns true no further chat
+    call starts and CancelledError is raised.
+    Returns (answer_text, number_of_map_calls).
+    """
+    def check():
+        if cancelled and cancelled():
+            raise CancelledError()
+
+    context_block = "\n".join(context_lines)
+    if estimate_tokens(context_block) <= max_single_prompt_tokens:
+        prompt = build_prompt(query, context_block)
+        if on_text and hasattr(co, "chat_stream"):
+            return chat_streamed(co, prompt, on_text, cancelled, chat_history), 0
+        check()
+        return chat(co, prompt, chat_history=chat_history), 0
+
+    chunks = chunk_lines(context_lines, chunk_tokens)
+    limiter = shared_rate_limiter(calls_per_minute)
+    prompts = [build_map_prompt(query, "\n".join(chunk), i, len(chunks))
+               for i, chunk in enumerate(chunks, start=1)]
+
+    def map_chat(prompt):
+        limiter.wait()
+        check()
+        return chat(co, prompt)
+
+    with ThreadPoolExecutor(max_workers=map_workers) as pool:
+        partial_answers = list(pool.map(map_chat, prompts))
+
+        # If the notes themselves are too long for one prompt, merge them in groups first
+        while estimate_tokens("\n\n".join(partial_answers)) > max_single_prompt_tokens:
+            groups = chunk_lines(partial_answers, chunk_tokens)
+            if len(groups) == len(partial_answers):
+                break
+            check()
+            partial_answers = list(pool.map(lambda g: chat(co, build_reduce_prompt(query, g), limiter), groups))
+
+    check()
+    return chat(co, build_reduce_prompt(query, partial_answers), limiter, chat_history), len(chunks)
@@ -0,0 +1,142 @@
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_KM = 6371.0
+CELL_DEGREES = 0.05  # grid cell size, about 5.5 km at the equator
+DEFAULT_RADIUS_KM = 10.0  # "near X" without a distance
+
+# Towns people ask about, (latitude, longitude)
+PLACES = {
+    "voi": (-3.396, 38.556),
+    "wundanyi": (-3.398, 38.362),
+    "mwatate": (-3.505, 38.378),
+    "taveta": (-3.398, 37.683),
+    "maungu": (-3.556, 38.745),
+    "mwakitau": (-3.453, 38.200),
+}
+
+_NUMBER = r"-?\d+(?:\.\d+)?"
+_TARGET = rf"(?:(?P<lat>{_NUMBER})\s*,\s*(?P<lon>{_NUMBER})|(?P<place>{'|'.join(PLACES)})\b)"
+# "within 20 km of -3.4, 38.4" / "within 5km of Voi"
+RADIUS_PATTERN = re.compile(
+    rf"within\s+(?P<km>{_NUMBER})\s*(?:km|kilometers?|kilometres?)\s+(?:of|from)\s+{_TARGET}",
+    re.IGNORECASE,
+)
+# "farms near Voi" / "close to -3.4, 38.4" / "around Wundanyi"
+NEAR_PATTERN = re.compile(rf"\b(?:near|close to|around)\s+{_TARGET}", re.IGNORECASE)
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance from one point to arrays of points."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# -------------------------------
+# Function: Find a location in a question
+# -------------------------------
+def parse_location(query):
+    """
+    Returns (lat, lon, radius_km, label) for "within N km of <place|lat, lon>" or
+    "near <place|lat, lon>", or None when the question names no known location.
+    """
+    for pattern in (RADIUS_PATTERN, NEAR_PATTERN):
+        m = pattern.search(query)
+        if not m:
+            continue
+        radius = float(m.group("km")) if "km" in m.groupdict() else DEFAULT_RADIUS_KM
+        if m.group("lat") is not None:
+            lat, lon = float(m.group("lat")), float(m.group("lon"))
+            return lat, lon, radius, f"{lat}, {lon}"
+        lat, lon = PLACES[m.group("place").lower()]
+        return lat, lon, radius, m.group("place").title()
+    return None
+
+
+# -------------------------------
+# Grid index over record coordinates
+# -------------------------------
+class GeoIndex:
+    """
+    Uniform lat/lon grid over record coordinates. Radius and bounding-box queries
+    scan only the cells they overlap and return positions into the arrays (and the
+    matching keys, e.g. farmer names, for metadata filters).
+    """
+
+    def __init__(self, lats, lons, keys=None, cell_degrees=CELL_DEGREES):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.keys = np.asarray(keys if keys is not None else np.arange(len(self.lats)), dtype=object)
+        self.cell_degrees = cell_degrees
+
+        valid = np.flatnonzero(~(np.isnan(self.lats) | np.isnan(self.lons)))
+        rows = np.floor(self.lats[valid] / cell_degrees).astype(np.int64)
+        cols = np.floor(self.lons[valid] / cell_degrees).astype(np.int64)
+        order = np.lexsort((cols, rows))
+        self._positions = valid[order]
+        cells, starts = np.unique(np.column_stack([rows[order], cols[order]]), axis=0, return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self._cells = {(int(r), int(c)): (s, e) for (r, c), s, e in zip(cells, starts, ends)}
+
+    @classmethod
+    def from_csv(cls, csv_path="corn_data.csv", key_column="Farmer"):
+        df = pd.read_csv(csv_path, usecols=["Latitude", "Longitude", key_column])
+        return cls(df["Latitude"], df["Longitude"], df[key_column].to_numpy())
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _candidates(self, south, west, north, east):
+        r0, r1 = math.floor(south / self.cell_degrees), math.floor(north / self.cell_degrees)
+        c0, c1 = math.floor(west / self.cell_degrees), math.floor(east / self.cell_degrees)
+        # Huge boxes touch more cells than exist: walk the occupied cells instead
+        if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self._cells):
+            spans = [span for (r, c), span in self._cells.items() if r0 <= r <= r1 and c0 <= c <= c1]
+        else:
+            spans = [self._cells[(r, c)] for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)
+                     if (r, c) in self._cells]
+        if not spans:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self._positions[s:e] for s, e in spans])
+
+    def bbox(self, south, west, north, east):
+        """Positions of the points inside the box, in index order."""
+        candidates = self._candidates(south, west, north, east)
+        lats, lons = self.lats[candidates], self.lons[candidates]
+        inside = (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+        return np.sort(candidates[inside])
+
+    def radius(self, lat, lon, km):
+        """(positions, distances_km) of the points within km of (lat, lon), nearest first."""
+        dlat = math.degrees(km / EARTH_RADIUS_KM)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        candidates = self._candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def key_filter(self, positions, field="farmer"):
+        """Pinecone-style metadata filter selecting the records at these positions."""
+        return {field: {"$in": [str(k) for k in self.keys[positions]]}}
+
+
+# -------------------------------
+# Function: Map viewport bounds
+# -------------------------------
+def viewport_bounds(lat, lon, zoom, width_px=1200, height_px=500):
+    """
+    (south, west, north, east) visible in a Web Mercator map of the given size
+    centred on (lat, lon) at a zoom level, for loading only the points on screen.
+    """
+    degrees_per_px = 360.0 / (256 * 2 ** zoom)
+    half_w = width_px / 2 * degrees_per_px
+    half_h = height_px / 2 * degrees_per_px * math.cos(math.radians(lat))
+    return (max(lat - half_h, -90.0), max(lon - half_w, -180.0),
+            min(lat + half_h, 90.0), min(lon + half_w, 180.0))
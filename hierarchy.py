@@ -0,0 +1,104 @@
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from aggregates import _slug, summarize_group
+
+# Target number of rows per level-one group; counties larger than this are split spatially
+TARGET_GROUP_SIZE = 50
+
+# Categorical columns whose most common value describes a group
+PROFILE_COLUMNS = ["Education", "Gender", "Age bracket", "Main credit source",
+                   "Main advisory source", "Extension provider", "Advisory language"]
+
+
+def _coordinates(rows):
+    lat = np.array([float(r.get("Latitude") or 0) for r in rows])
+    lon = np.array([float(r.get("Longitude") or 0) for r in rows])
+    # Scale longitude so euclidean distance approximates ground distance
+    return np.column_stack([lat, lon * np.cos(np.radians(lat.mean()))])
+
+
+def _kmeans(points, k, iterations=25):
+    """Small deterministic k-means; returns the cluster label of every point."""
+    # Seed centroids at evenly spaced points along the latitude order
+    order = np.argsort(points[:, 0], kind="stable")
+    centroids = points[order[np.linspace(0, len(points) - 1, k).astype(int)]].copy()
+    labels = np.zeros(len(points), dtype=int)
+    for iteration in range(iterations):
+        distances = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if iteration > 0 and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = points[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return labels
+
+
+# -------------------------------
+# Function: Assign every row to a level-one group
+# -------------------------------
+def assign_groups(rows, target_size=TARGET_GROUP_SIZE):
+    """
+    Groups rows by county and splits each county into spatial clusters of roughly
+    target_size rows. Returns one group id per row, in row order.
+    """
+    by_county = defaultdict(list)
+    for pos, row in enumerate(rows):
+        by_county[(row.get("County") or "Unknown").strip()].append(pos)
+
+    group_ids = [None] * len(rows)
+    for county, positions in by_county.items():
+        k = max(1, round(len(positions) / target_size))
+        if k == 1:
+            labels = np.zeros(len(positions), dtype=int)
+        else:
+            labels = _kmeans(_coordinates([rows[p] for p in positions]), k)
+        for pos, label in zip(positions, labels):
+            group_ids[pos] = f"{_slug(county)}-{label + 1:02d}"
+    return group_ids
+
+
+# -------------------------------
+# Function: Build the level-one group documents
+# -------------------------------
+def build_group_documents(rows, group_ids):
+    """
+    One (id, text, metadata) document per group with its location, statistics,
+    typical farmer profile and member farmers. doc_type="group" marks level one.
+    """
+    members = defaultdict(list)
+    for row, group_id in zip(rows, group_ids):
+        members[group_id].append(row)
+
+    documents = []
+    for group_id, group_rows in sorted(members.items()):
+        county = (group_rows[0].get("County") or "Unknown").strip()
+        coords = _coordinates(group_rows)
+        lat = float(np.mean([float(r.get("Latitude") or 0) for r in group_rows]))
+        lon = float(np.mean([float(r.get("Longitude") or 0) for r in group_rows]))
+        # ~111 km per degree; radius covering the group's members
+        radius_km = float(np.sqrt(((coords - coords.mean(axis=0)) ** 2).sum(axis=1)).max()) * 111
+
+        profile = []
+        for column in PROFILE_COLUMNS:
+            values = Counter((r.get(column) or "Unknown").strip() for r in group_rows)
+            value, count = values.most_common(1)[0]
+            profile.append(f"{column}: mostly {value} ({count} of {len(group_rows)})")
+
+        stats_text, stats = summarize_group(group_rows, f"farms in area {group_id} of {county} county")
+        farmers = [r.get("Farmer", "Unknown") for r in group_rows]
+        text = (
+            f"Farm area {group_id} in {county} county around latitude {lat:.2f}, longitude {lon:.2f} "
+            f"(within about {math.ceil(radius_km)} km). {stats_text} "
+            f"{'; '.join(profile)}. Farmers: {', '.join(farmers)}."
+        )
+        documents.append((f"group-{group_id}", text, {
+            "doc_type": "group", "group_id": group_id, "county": county,
+            "latitude": round(lat, 4), "longitude": round(lon, 4), "text": text, "count": stats["count"],
+        }))
+    return documents
@@ -0,0 +1,205 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+import columnar_store
+from data_versions import LEGACY_CSV, promote, read_current
+from local_index import LocalIndex
+
+SNAPSHOT_FORMAT = 1
+VECTORS_FILE = "vectors.bin"     # raw little-endian float32, one row per vector
+RECORDS_FILE = "records.jsonl"   # {"id": ..., "metadata": {...}} per line, same order
+MANIFEST_FILE = "manifest.json"
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# -------------------------------
+# Function: Export an index into a snapshot directory
+# -------------------------------
+def export_snapshot(index, out_dir, namespace=None, fetch_batch=100, source=None, data_version=None):
+    """
+    Streams every vector of a namespace (ids via index.list, values and metadata
+    via index.fetch) into out_dir. data_version, the pointer info of the version
+    the namespace holds, is recorded so an import can serve it again. Returns the
+    manifest that was written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    vectors_path = os.path.join(out_dir, VECTORS_FILE)
+    records_path = os.path.join(out_dir, RECORDS_FILE)
+
+    count, dimension = 0, None
+    kwargs = {"namespace": namespace} if namespace else {}
+    with open(vectors_path, "wb") as vf, open(records_path, "w", encoding="utf-8") as rf:
+        for page in index.list(**kwargs):
+            for start in range(0, len(page), fetch_batch):
+                ids = page[start:start + fetch_batch]
+                fetched = index.fetch(ids=ids, **kwargs)["vectors"]
+                for vec_id in ids:
+                    vector = fetched.get(vec_id)
+                    if vector is None:  # deleted between list and fetch
+                        continue
+                    values = np.asarray(vector["values"], dtype="<f4")
+                    if dimension is None:
+                        dimension = len(values)
+                    vf.write(values.tobytes())
+                    rf.write(json.dumps({"id": vec_id, "metadata": vector.get("metadata") or {}}) + "\n")
+                    count += 1
+
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "source": source,
+        "namespace": namespace or "",
+        "data_version": data_version,
+        "count": count,
+        "dimension": dimension or 0,
+        "dtype": "float32",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "checksums": {
+            VECTORS_FILE: _sha256(vectors_path),
+            RECORDS_FILE: _sha256(records_path),
+        },
+    }
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# -------------------------------
+# Function: Read a snapshot back
+# -------------------------------
+def read_manifest(snapshot_dir, verify=True):
+    """Loads the manifest and, unless verify=False, checks both file checksums."""
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format: {manifest.get('format')}")
+    if verify:
+        for name, expected in manifest["checksums"].items():
+            if _sha256(os.path.join(snapshot_dir, name)) != expected:
+                raise ValueError(f"Checksum mismatch for {name} in {snapshot_dir}")
+    return manifest
+
+
+def load_snapshot_arrays(snapshot_dir, verify=True):
+    """Returns (manifest, ids, vectors, metadata); vectors is a read-only memmap."""
+    manifest = read_manifest(snapshot_dir, verify)
+    ids, metadata = [], []
+    with open(os.path.join(snapshot_dir, RECORDS_FILE), encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            ids.append(record["id"])
+            metadata.append(record["metadata"])
+    if manifest["count"]:
+        vectors = np.memmap(os.path.join(snapshot_dir, VECTORS_FILE), dtype="<f4", mode="r",
+                            shape=(manifest["count"], manifest["dimension"]))
+    else:
+        vectors = np.zeros((0, manifest["dimension"]), dtype=np.float32)
+    return manifest, ids, vectors, metadata
+
+
+def iter_snapshot_vectors(snapshot_dir, verify=True):
+    """Yield Pinecone-style vector dicts from a snapshot."""
+    _, ids, vectors, metadata = load_snapshot_arrays(snapshot_dir, verify)
+    for vec_id, values, meta in zip(ids, vectors, metadata):
+        yield {"id": vec_id, "values": values.tolist(), "metadata": meta}
+
+
+def load_local_index(snapshot_dir, verify=True, namespace=None):
+    """
+    Bulk-loads a snapshot into a new LocalIndex in one matrix copy, into the
+    namespace it was exported from unless another is given.
+    """
+    manifest, ids, vectors, metadata = load_snapshot_arrays(snapshot_dir, verify)
+    index = LocalIndex(manifest["dimension"])
+    index.bulk_load(ids, vectors, metadata, namespace=namespace if namespace is not None else manifest["namespace"])
+    return index
+
+
+def snapshot_pointer(manifest, namespace=None):
+    """
+    Pointer info that serves an imported snapshot: its recorded data version in
+    `namespace` (default: the exported one). When the version's CSV isn't on this
+    machine (a fresh checkout), the dashboard reads corn_data.csv instead.
+    """
+    info = dict(manifest.get("data_version") or {})
+    info.pop("previous", None)
+    info.setdefault("version", f"snapshot-{manifest['checksums'][VECTORS_FILE][:12]}")
+    if not os.path.exists(info.get("csv_path") or ""):
+        info.update(csv_path=LEGACY_CSV, columnar_dir=columnar_store.DATASET_DIR)
+    info["namespace"] = (namespace if namespace is not None else manifest["namespace"]) or None
+    return info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import index snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="stream the Pinecone index into a snapshot directory")
+    export_cmd.add_argument("snapshot_dir")
+    export_cmd.add_argument("--namespace", default=None,
+                            help="namespace to export (default: the data version currently served)")
+
+    import_cmd = sub.add_parser("import", help="bulk-load a snapshot into Pinecone or a local index")
+    import_cmd.add_argument("snapshot_dir")
+    import_cmd.add_argument("--target", choices=["pinecone", "local"], default="pinecone")
+    import_cmd.add_argument("--namespace", default=None, help="override the namespace recorded in the snapshot")
+    import_cmd.add_argument("--workers", type=int, default=4)
+    import_cmd.add_argument("--keep-pointer", action="store_true",
+                            help="don't point the app at the imported namespace (data/current.json)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "import" and args.target == "local":
+        index = load_local_index(args.snapshot_dir, namespace=args.namespace)
+        print(f"Loaded local index: {index.describe_index_stats()['total_vector_count']} vectors "
+              f"in {time.perf_counter() - start:.2f}s")
+        if not args.keep_pointer:
+            info = snapshot_pointer(read_manifest(args.snapshot_dir, verify=False), args.namespace)
+            promote(info)
+            print(f"Now serving {info['version']} from namespace {info['namespace']!r}")
+        return
+
+    from dotenv import load_dotenv
+    from pinecone import Pinecone
+    from upsert_writer import UpsertWriter
+
+    load_dotenv()
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    index_name = os.getenv("PINECONE_INDEX_NAME")
+    index = pc.Index(index_name)
+
+    if args.command == "export":
+        # Data lives in per-version namespaces; export the served one unless told otherwise
+        current = read_current()
+        namespace = args.namespace if args.namespace is not None else current["namespace"]
+        data_version = None
+        if namespace == current["namespace"]:
+            data_version = {k: v for k, v in current.items() if k != "previous"}
+        manifest = export_snapshot(index, args.snapshot_dir, namespace=namespace, source=index_name,
+                                   data_version=data_version)
+        print(f"Exported {manifest['count']} vectors from namespace {manifest['namespace']!r} "
+              f"to {args.snapshot_dir} in {time.perf_counter() - start:.2f}s")
+    else:
+        manifest = read_manifest(args.snapshot_dir)
+        namespace = args.namespace if args.namespace is not None else manifest["namespace"]
+        writer = UpsertWriter(index, max_workers=args.workers, namespace=namespace or None)
+        print(writer.write(iter_snapshot_vectors(args.snapshot_dir, verify=False)))
+        if not args.keep_pointer:
+            info = snapshot_pointer(manifest, namespace)
+            promote(info)
+            print(f"Now serving {info['version']} from namespace {info['namespace']!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import columnar_store
+from csv_ingest import (EMBED_MODEL, build_documents, check_journal_complete, embed_documents, journal_fingerprint,
+                        read_rows)
+from data_versions import (CURRENT_POINTER, VERSIONS_DIR, content_version, promote, read_current,
+                           retire_version, sample_vectors, validate_version, version_info)
+from embedding_journal import EmbeddingJournal
+from upsert_writer import UpsertWriter
+
+
+class IngestJob:
+    """Progress of one upload's ingestion, safe to read from the UI thread."""
+
+    def __init__(self, filename):
+        self.id = uuid.uuid4().hex[:8]
+        self.filename = filename
+        self.version = None
+        self.phase = "queued"
+        self.done = 0
+        self.total = 0
+        self.unit = "batches"
+        self.rows = 0
+        self.error = None
+        self.created_at = time.time()
+        self.phase_started = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def set_phase(self, phase, total=0, unit="batches"):
+        with self.lock:
+            self.phase = phase
+            self.done, self.total, self.unit = 0, total, unit
+            self.phase_started = time.perf_counter()
+
+    def fail(self, error):
+        with self.lock:
+            self.error = error
+            self.phase = "failed"
+
+    def advance(self, done, total=None):
+        with self.lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+
+    def snapshot(self):
+        """Phase, progress fraction, throughput (units/s) and ETA (s) of the current phase."""
+        with self.lock:
+            elapsed = time.perf_counter() - self.phase_started if self.phase_started else 0.0
+            rate = self.done / elapsed if elapsed > 0 and self.done else None
+            remaining = max(self.total - self.done, 0)
+            return {
+                "id": self.id,
+                "filename": self.filename,
+                "version": self.version,
+                "phase": self.phase,
+                "done": self.done,
+                "total": self.total,
+                "unit": self.unit,
+                "fraction": self.done / self.total if self.total else 0.0,
+                "throughput": rate,
+                "eta_seconds": remaining / rate if rate else None,
+                "rows": self.rows,
+                "error": self.error,
+            }
+
+
+# -------------------------------
+# Background ingestion runner
+# -------------------------------
+class IngestJobRunner:
+    """
+    Runs uploaded CSVs through prepare -> embed -> upsert on one background worker
+    (jobs queue behind each other; queries are never blocked). Each upload becomes
+    its own data version: files under data/versions/<version>/ and vectors in the
+    index namespace "v-<version>". The CURRENT_POINTER file is switched only once
+    everything is upserted and validated, so the app moves to the new data in one
+    step; the replaced version is deleted after a grace period.
+
+    An upload of the data already being served is refused, and a version's files
+    are written to a temporary directory first, so live files are never rewritten.
+    Rows are prepared on spawned processes: forking the multithreaded app server
+    could copy locks held by other threads.
+    """
+
+    def __init__(self, co, index, versions_dir=VERSIONS_DIR, pointer_path=CURRENT_POINTER,
+                 upsert_workers=4):
+        self.co = co
+        self.index = index
+        self.versions_dir = versions_dir
+        self.pointer_path = pointer_path
+        self.upsert_workers = upsert_workers
+        self.jobs = {}
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+    def submit(self, csv_bytes, filename="upload.csv"):
+        """Queue an uploaded CSV (raw bytes); returns the IngestJob to poll."""
+        job = IngestJob(filename)
+        self.jobs[job.id] = job
+        self._worker.submit(self._run, job, csv_bytes)
+        return job
+
+    def latest(self):
+        return max(self.jobs.values(), key=lambda j: j.created_at, default=None)
+
+    def _run(self, job, csv_bytes):
+        try:
+            self._ingest(job, csv_bytes)
+        except Exception as e:
+            job.fail(f"{type(e).__name__}: {e}")
+            traceback.print_exc()
+        finally:
+            with job.lock:
+                job.finished_at = time.time()
+
+    def _stage_files(self, info, csv_bytes):
+        """Write the CSV (and Parquet dataset) to a temporary directory, then move them into place."""
+        version_dir = os.path.dirname(info["csv_path"])
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix=f".{info['version']}-", dir=self.versions_dir)
+        try:
+            staged_csv = os.path.join(staging_dir, os.path.basename(info["csv_path"]))
+            with open(staged_csv, "wb") as f:
+                f.write(csv_bytes)
+            staged_columnar = os.path.join(staging_dir, os.path.basename(info["columnar_dir"]))
+            if columnar_store.pa is not None:
+                columnar_store.write_dataset(staged_csv, staged_columnar)
+
+            os.makedirs(version_dir, exist_ok=True)
+            os.replace(staged_csv, info["csv_path"])
+            if os.path.isdir(staged_columnar):
+                if os.path.isdir(info["columnar_dir"]):
+                    shutil.rmtree(info["columnar_dir"])
+                os.replace(staged_columnar, info["columnar_dir"])
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def _ingest(self, job, csv_bytes):
+        version = content_version([csv_bytes], EMBED_MODEL)
+        with job.lock:
+            job.version = version
+        if version == read_current(self.pointer_path).get("version"):
+            raise ValueError(f"{job.filename} is the data already being served (version {version})")
+        info = version_info(version, self.versions_dir)
+        version_dir = os.path.dirname(info["csv_path"])
+        csv_path = info["csv_path"]
+
+        job.set_phase("preparing", total=1, unit="steps")
+        self._stage_files(info, csv_bytes)
+        rows = read_rows(csv_path, mp_context=multiprocessing.get_context("spawn"))
+        with job.lock:
+            job.rows = len(rows)
+        documents = build_documents(rows)
+        job.advance(1)
+
+        # The journal lives with the version, so a restarted job resumes its batches
+        journal = EmbeddingJournal(os.path.join(version_dir, "journal"), journal_fingerprint(csv_path))
+        job.set_phase("embedding")
+        embed_documents(self.co, documents, journal, progress=job.advance)
+        check_journal_complete(journal, documents)
+
+        job.set_phase("upserting", total=len(journal), unit="vectors")
+        writer = UpsertWriter(self.index, max_workers=self.upsert_workers, namespace=info["namespace"])
+        writer.write(journal.iter_vectors(), progress=lambda report: job.advance(report.rows))
+
+        # Serve the new namespace only once it holds every vector and finds sampled rows
+        job.set_phase("validating", total=1, unit="steps")
+        validate_version(self.index, info["namespace"], len(documents), sample_vectors(journal))
+        job.advance(1)
+
+        job.set_phase("switching", total=1, unit="steps")
+        previous = promote(info, self.pointer_path)
+        job.advance(1)
+        job.set_phase("done", total=1, unit="steps")
+        job.advance(1)
+        if previous is not None:
+            threading.Thread(target=retire_version, args=(self.index, previous, self.versions_dir),
+                             kwargs={"pointer_path": self.pointer_path}, daemon=True).start()
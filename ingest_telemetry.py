@@ -0,0 +1,195 @@
+import cProfile
+import glob
+import io
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+REPORT_DIR = "ingest_reports"
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BOUNDS_MS = [50, 100, 200, 500, 1000, 2000, 5000]
+PROFILE_TOP_FUNCTIONS = 25
+
+
+def latency_summary(seconds):
+    """Percentiles and a bucketed histogram (ms) of a list of durations in seconds."""
+    if not seconds:
+        return {"count": 0}
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    counts = np.histogram(ms, bins=[0] + HISTOGRAM_BOUNDS_MS + [np.inf])[0]
+    labels = [f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 1),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "max_ms": round(float(ms.max()), 1),
+        "histogram": dict(zip(labels, counts.tolist())),
+    }
+
+
+# -------------------------------
+# Ingestion telemetry
+# -------------------------------
+class IngestTelemetry:
+    """
+    Collects where an ingestion run spends its time: wall time per stage, each
+    embed call's latency and payload size, the fixed inter-batch sleep, and the
+    upsert report. With profile=True the local stages also run under cProfile and
+    tracemalloc (peak memory per stage).
+    """
+
+    def __init__(self, csv_path, profile=False):
+        self.csv_path = csv_path
+        self.profile = profile
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.memory_peak_mb = {}
+        self.rows = 0
+        self.documents = 0
+        self.embed_seconds = []
+        self.embed_texts = 0
+        self.embed_bytes = 0
+        self.embed_skipped = 0
+        self.upsert = None
+        self._profiler = cProfile.Profile() if profile else None
+
+    def add_stage(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name, local=False):
+        """Times a stage; local (CPU-bound, in-process) stages are profiled in profile mode."""
+        profiling = self.profile and local
+        if profiling:
+            tracemalloc.start()
+            self._profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+            if profiling:
+                self._profiler.disable()
+                self.memory_peak_mb[name] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+                tracemalloc.stop()
+
+    def record_embed(self, texts, seconds):
+        self.embed_seconds.append(seconds)
+        self.embed_texts += len(texts)
+        self.embed_bytes += len(json.dumps(texts).encode("utf-8"))
+        self.add_stage("embed", seconds)
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start
+        embed_api = sum(self.embed_seconds)
+        report = {
+            "started_at": self.started_at,
+            "csv": self.csv_path,
+            "rows": self.rows,
+            "documents": self.documents,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 2) if elapsed else 0.0,
+            "stages_s": {k: round(v, 3) for k, v in self.stages.items()},
+            "embed": {
+                "batches": len(self.embed_seconds),
+                "skipped_batches": self.embed_skipped,
+                "texts": self.embed_texts,
+                "bytes_sent": self.embed_bytes,
+                "texts_per_api_second": round(self.embed_texts / embed_api, 2) if embed_api else None,
+                "latency": latency_summary(self.embed_seconds),
+            },
+        }
+        if self.upsert is not None:
+            report["upsert"] = {
+                "rows": self.upsert.rows,
+                "chunks": self.upsert.chunks,
+                "retries": self.upsert.retries,
+                "failed": len(self.upsert.failed_ids),
+                "bytes_sent": self.upsert.bytes_sent,
+                "rows_per_second": round(self.upsert.rows_per_second, 2),
+                "latency": latency_summary(self.upsert.chunk_seconds),
+            }
+        if self._profiler is not None:
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            report["profile"] = {"memory_peak_mb": self.memory_peak_mb, "top_functions": out.getvalue()}
+        return report
+
+
+def previous_report(report_dir=REPORT_DIR):
+    paths = sorted(glob.glob(os.path.join(report_dir, "ingest-*.json")))
+    if not paths:
+        return None
+    with open(paths[-1], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _delta(current, previous):
+    if previous in (None, 0) or current is None:
+        return ""
+    return f" ({(current - previous) / previous:+.0%} vs previous run)"
+
+
+def format_summary(report, previous=None):
+    """Human-readable run summary; with a previous report, key numbers show their change."""
+    prev = previous or {}
+    lines = [
+        f"Ingestion of {report['csv']} at {report['started_at']}",
+        f"  {report['rows']} rows / {report['documents']} documents in {report['elapsed_s']:.1f} s "
+        f"= {report['rows_per_second']:.1f} rows/s{_delta(report['rows_per_second'], prev.get('rows_per_second'))}",
+        "  Time per stage:",
+    ]
+    total = report["elapsed_s"] or 1.0
+    for name, seconds in sorted(report["stages_s"].items(), key=lambda kv: -kv[1]):
+        lines.append(f"    {name:<12}{seconds:>9.2f} s  {seconds / total:>5.0%}")
+
+    embed = report["embed"]
+    latency = embed["latency"]
+    lines.append(f"  Embed: {embed['batches']} calls ({embed['skipped_batches']} batches resumed from the journal), "
+                 f"{embed['texts']} texts, {embed['bytes_sent'] / 1e6:.2f} MB sent")
+    if latency["count"]:
+        prev_p95 = prev.get("embed", {}).get("latency", {}).get("p95_ms")
+        lines.append(f"    latency p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms{_delta(latency['p95_ms'], prev_p95)}, "
+                     f"max {latency['max_ms']} ms")
+        lines.append("    histogram: " + ", ".join(f"{k} {v}" for k, v in latency["histogram"].items() if v))
+
+    upsert = report.get("upsert")
+    if upsert:
+        lines.append(f"  Upsert: {upsert['rows']} vectors in {upsert['chunks']} chunks, "
+                     f"{upsert['bytes_sent'] / 1e6:.2f} MB sent, {upsert['retries']} retries, {upsert['failed']} failed, "
+                     f"{upsert['rows_per_second']:.0f} rows/s"
+                     f"{_delta(upsert['rows_per_second'], prev.get('upsert', {}).get('rows_per_second'))}")
+        if upsert["latency"]["count"]:
+            lines.append(f"    chunk latency p50 {upsert['latency']['p50_ms']} ms, p95 {upsert['latency']['p95_ms']} ms")
+
+    profile = report.get("profile")
+    if profile:
+        lines.append("  Peak traced memory per local stage: "
+                     + ", ".join(f"{k} {v} MB" for k, v in profile["memory_peak_mb"].items()))
+    return "\n".join(lines)
+
+
+def write_report(report, report_dir=REPORT_DIR):
+    """Writes ingest-<timestamp>.json and .txt (summary, plus the profile if any); returns the JSON path."""
+    previous = previous_report(report_dir)
+    os.makedirs(report_dir, exist_ok=True)
+    stem = os.path.join(report_dir, "ingest-" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S"))
+    summary = format_summary(report, previous)
+    with open(stem + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(stem + ".txt", "w", encoding="utf-8") as f:
+        f.write(summary + "\n")
+        if "profile" in report:
+            f.write("\n" + report["profile"]["top_functions"])
+    print(summary)
+    return stem + ".json"
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from retrieval import FARMER_ID_PATTERN, QueryPlan, classify_query
+
+EMBED_MODEL = "embed-english-v3.0"
+PROTOTYPE_CACHE = ".intent_prototypes.npz"
+# Below this gap between the best and second-best intent the keyword rules decide
+MIN_MARGIN = 0.02
+
+# Example phrasings per query class; a question takes the class of its nearest example
+INTENT_PROTOTYPES = {
+    "lookup": [
+        "Tell me about farmer fmr_12",
+        "Show the details of a specific farmer",
+        "What does this particular farmer grow and how much do they harvest?",
+    ],
+    "aggregate": [
+        "What is the average yield per county?",
+        "How many farmers use credit groups?",
+        "Give me the breakdown of yield by education level",
+        "What percentage of farmers are women?",
+        "Summarize the overall dataset",
+        "What is the total acreage farmed?",
+    ],
+    "ranking": [
+        "Which farmers have the highest yield?",
+        "Who is the most productive farmer?",
+        "Top 10 farms by acreage",
+        "Which farm uses the least fertilizer?",
+        "Rank the farmers by how much corn they harvest",
+        "Who are the best performing farmers?",
+    ],
+    "listing": [
+        "List all female farmers",
+        "Show me farmers with secondary education",
+        "Which farmers use solar power?",
+        "All farmers who get advice from the radio",
+        "Who relies on rain for water?",
+    ],
+    "general": [
+        "What do farmers in this region grow?",
+        "How do farmers get agricultural advice?",
+        "Describe the farming practices in the data",
+        "What challenges do small farms face?",
+    ],
+}
+
+# Example phrasings per sort field ("relevance" keeps similarity order)
+SORT_PROTOTYPES = {
+    "yield": [
+        "highest yield", "most productive farmer", "who harvests the most corn",
+        "best producing farms", "largest production in bushels",
+    ],
+    "acreage": [
+        "largest farm", "most land", "biggest farm size in acres", "smallest plots of land",
+    ],
+    "fertilizer": [
+        "uses the most fertilizer", "heaviest chemical inputs", "least fertilizer applied",
+    ],
+    "relevance": [
+        "tell me about a farmer", "how do farmers get advice", "what language is advice given in",
+        "describe the farmers", "which farmers are women",
+    ],
+}
+
+
+class PrototypeSet:
+    """Unit-normalized prototype embeddings grouped by label."""
+
+    def __init__(self, labels, vectors):
+        order = np.argsort(labels, kind="stable")
+        self.labels = [labels[i] for i in order]
+        vectors = np.asarray(vectors, dtype=np.float32)[order]
+        self.matrix = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        self.names, self.starts = np.unique(self.labels, return_index=True)
+
+    def scores(self, embedding):
+        """Best cosine similarity per label, as (names, scores)."""
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        sims = self.matrix @ q
+        return self.names, np.maximum.reduceat(sims, self.starts)
+
+    def best(self, embedding):
+        """(label, margin over the runner-up)."""
+        names, scores = self.scores(embedding)
+        order = np.argsort(scores)[::-1]
+        margin = scores[order[0]] - scores[order[1]] if len(order) > 1 else np.inf
+        return str(names[order[0]]), float(margin)
+
+
+def _flatten(prototypes):
+    labels, texts = [], []
+    for label, examples in prototypes.items():
+        labels.extend([label] * len(examples))
+        texts.extend(examples)
+    return labels, texts
+
+
+def _cache_key(model):
+    payload = json.dumps([model, INTENT_PROTOTYPES, SORT_PROTOTYPES], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# -------------------------------
+# Intent router
+# -------------------------------
+class IntentRouter:
+    """
+    Routes a question from its query embedding: nearest prototype picks the query
+    class (and so the structured/RAG path and top_k) and the sort field. Costs a
+    matrix-vector product per question; the prototypes are embedded once and kept
+    on disk. When the best intent barely beats the runner-up the keyword rules of
+    classify_query decide instead.
+    """
+
+    def __init__(self, intents, sorts, min_margin=MIN_MARGIN):
+        self.intents = intents
+        self.sorts = sorts
+        self.min_margin = min_margin
+        self.last_route_seconds = 0.0
+
+    @classmethod
+    def from_embeddings(cls, intent_vectors, sort_vectors, **kwargs):
+        intent_labels, _ = _flatten(INTENT_PROTOTYPES)
+        sort_labels, _ = _flatten(SORT_PROTOTYPES)
+        return cls(PrototypeSet(intent_labels, intent_vectors), PrototypeSet(sort_labels, sort_vectors), **kwargs)
+
+    @classmethod
+    def load_or_build(cls, co, cache_path=PROTOTYPE_CACHE, model=EMBED_MODEL, **kwargs):
+        """Loads cached prototype embeddings, or embeds them with one Cohere call and caches them."""
+        key = _cache_key(model)
+        if os.path.exists(cache_path):
+            cached = np.load(cache_path)
+            if str(cached["key"]) == key:
+                return cls.from_embeddings(cached["intents"], cached["sorts"], **kwargs)
+
+        _, intent_texts = _flatten(INTENT_PROTOTYPES)
+        _, sort_texts = _flatten(SORT_PROTOTYPES)
+        response = co.embed(texts=intent_texts + sort_texts, model=model,
+                            input_type="search_query", embedding_types=["float"])
+        vectors = np.asarray(response.embeddings.float, dtype=np.float32)
+        intents, sorts = vectors[:len(intent_texts)], vectors[len(intent_texts):]
+
+        tmp_path = cache_path + ".tmp.npz"
+        np.savez(tmp_path, key=key, intents=intents, sorts=sorts)
+        os.replace(tmp_path, cache_path)
+        return cls.from_embeddings(intents, sorts, **kwargs)
+
+    def route(self, query, embedding):
+        """QueryPlan for a question whose embedding is already computed."""
+        start = time.perf_counter()
+        fallback = None
+
+        # An explicit farmer id is unambiguous
+        if FARMER_ID_PATTERN.search(query):
+            query_class = "lookup"
+        else:
+            query_class, margin = self.intents.best(embedding)
+            if margin < self.min_margin:
+                fallback = classify_query(query)
+                query_class = fallback.query_class
+
+        sort_type, margin = self.sorts.best(embedding)
+        if margin < self.min_margin:
+            sort_type = (fallback or classify_query(query)).sort_type
+
+        self.last_route_seconds = time.perf_counter() - start
+        return QueryPlan(query_class, sort_type)
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from pipeline import run_pipeline
+from simulated_backends import SimulatedCohere, SimulatedIndex, build_simulated_index
+from single_flight import SingleFlight, normalize_query
+
+# Questions simulated users pick from (the sidebar examples plus typical variations)
+QUESTIONS = [
+    "Which counties have the highest yield?",
+    "Show me farms with low acreage",
+    "What's the average yield per county?",
+    "List all crops in the dataset",
+    "Which farmer has the highest yield?",
+    "Who are the female farmers with the most acreage?",
+    "Tell me about fmr_65",
+    "What is the education breakdown of yield?",
+    "How many farmers use credit groups?",
+    "Which farmers use the most fertilizer?",
+    "What do farmers with secondary education grow?",
+]
+
+STAGES = ["embed", "retrieve", "generate", "coalesced", "total"]
+# Stages timed inside a request's own pipeline run
+WORK_STAGES = ["embed", "retrieve", "generate"]
+
+
+class StageRecorder:
+    """Collects per-request stage durations from instrumented client wrappers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.samples = {stage: [] for stage in STAGES}
+        self.errors = 0
+
+    def start(self):
+        self.local.current = {stage: 0.0 for stage in STAGES}
+
+    def add(self, stage, seconds):
+        current = getattr(self.local, "current", None)
+        if current is not None:
+            current[stage] += seconds
+
+    def finish(self, total, failed=False, coalesced=False):
+        """
+        Records a finished request. A coalesced request (a single-flight follower)
+        only waited for another user's run: its wait goes to the "coalesced" stage,
+        not as zero embed/retrieve/generate times.
+        """
+        current = self.local.current
+        with self.lock:
+            if failed:
+                self.errors += 1
+                return
+            self.samples["total"].append(total)
+            if coalesced:
+                self.samples["coalesced"].append(total)
+            else:
+                for stage in WORK_STAGES:
+                    self.samples[stage].append(current[stage])
+
+
+class _Timed:
+    """Proxy that times the listed methods of a client into a recorder stage."""
+
+    def __init__(self, target, recorder, stages):
+        self._target = target
+        self._recorder = recorder
+        self._stages = stages
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        stage = self._stages.get(name)
+        if stage is None:
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._recorder.add(stage, time.perf_counter() - start)
+        return timed
+
+
+class MemorySampler(threading.Thread):
+    """Samples traced Python heap size and process RSS every interval seconds."""
+
+    def __init__(self, interval=1.0):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []  # (elapsed seconds, traced MB, rss MB)
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def rss_mb():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+        except (OSError, ValueError):
+            return float("nan")
+
+    def run(self):
+        start = time.perf_counter()
+        while not self.stopped.wait(self.interval):
+            traced, _ = tracemalloc.get_traced_memory()
+            self.samples.append((time.perf_counter() - start, traced / 1e6, self.rss_mb()))
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(p50 * 1000, 1), "p95": round(p95 * 1000, 1), "p99": round(p99 * 1000, 1)}
+
+
+# -------------------------------
+# Function: Run one load level
+# -------------------------------
+def run_load(co, index, users, duration, think_time=1.0, single_flight=False, seed=0, namespace=None):
+    """
+    Drives run_pipeline from `users` threads for `duration` seconds, each simulated
+    user asking a random question and pausing for an exponential think time.
+    Returns a report dict with throughput, per-stage percentiles (ms) and memory.
+    """
+    recorder = StageRecorder()
+    timed_co = _Timed(co, recorder, {"embed": "embed", "chat": "generate"})
+    timed_index = _Timed(index, recorder, {"query": "retrieve", "describe_index_stats": "retrieve"})
+    flights = SingleFlight() if single_flight else None
+    deadline = time.perf_counter() + duration
+
+    def user(user_no):
+        rng = random.Random(seed * 1000 + user_no)
+        while time.perf_counter() < deadline:
+            query = rng.choice(QUESTIONS)
+            recorder.start()
+            start = time.perf_counter()
+            failed = coalesced = False
+            try:
+                if flights:
+                    _, coalesced = flights.do(normalize_query(query), run_pipeline, timed_co, timed_index, query,
+                               namespace=namespace)
+                else:
+                    run_pipeline(timed_co, timed_index, query, namespace=namespace)
+            except Exception:
+                failed = True
+            recorder.finish(time.perf_counter() - start, failed, coalesced)
+            time.sleep(rng.expovariate(1 / think_time) if think_time else 0)
+
+    tracemalloc.start()
+    sampler = MemorySampler()
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(n,)) for n in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    completed = len(recorder.samples["total"])
+    return {
+        "users": users,
+        "duration_s": round(elapsed, 2),
+        "completed": completed,
+        "errors": recorder.errors,
+        "throughput_rps": round(completed / elapsed, 3) if elapsed else 0.0,
+        "latency_ms": {stage: percentiles(recorder.samples[stage]) for stage in STAGES},
+        "memory": {
+            "traced_peak_mb": round(peak / 1e6, 2),
+            "traced_growth_mb": round(sampler.samples[-1][1] - sampler.samples[0][1], 2) if len(sampler.samples) > 1 else 0.0,
+            "rss_start_mb": round(sampler.samples[0][2], 1) if sampler.samples else None,
+            "rss_end_mb": round(sampler.samples[-1][2], 1) if sampler.samples else None,
+        },
+        "coalesced": flights.shared if flights else 0,
+    }
+
+
+def print_report(report):
+    print(f"\n=== {report['users']} concurrent users: {report['completed']} requests in {report['duration_s']}s "
+          f"({report['throughput_rps']} req/s, {report['errors']} errors, {report['coalesced']} coalesced) ===")
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, p in report["latency_ms"].items():
+        print(f"{stage:<10}{p['p50'] or '-':>10}{p['p95'] or '-':>10}{p['p99'] or '-':>10}")
+    m = report["memory"]
+    print(f"memory: traced peak {m['traced_peak_mb']} MB, traced growth {m['traced_growth_mb']} MB, "
+          f"RSS {m['rss_start_mb']} -> {m['rss_end_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the answer pipeline against simulated Cohere/Pinecone")
+    parser.add_argument("--users", default="1,5,10,25", help="comma-separated concurrency levels to sweep")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between a user's questions (s)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply all simulated latencies")
+    parser.add_argument("--single-flight", action="store_true", help="coalesce identical in-flight questions")
+    parser.add_argument("--csv", default="corn_data.csv")
+    parser.add_argument("--snapshot", help="serve this index snapshot instead of building one from --csv")
+    parser.add_argument("--json", help="also write the reports to this JSON file")
+    args = parser.parse_args()
+
+    namespace = None
+    if args.snapshot:
+        from index_snapshot import load_local_index, read_manifest
+        local = load_local_index(args.snapshot)
+        # Snapshots of versioned data hold it in the version's namespace, not the default one
+        namespace = read_manifest(args.snapshot, verify=False)["namespace"] or None
+    else:
+        local = build_simulated_index(args.csv)
+    co = SimulatedCohere(dimension=local.dimension, scale=args.latency_scale)
+    index = SimulatedIndex(local, scale=args.latency_scale)
+
+    reports = []
+    for users in (int(u) for u in args.users.split(",")):
+        report = run_load(co, index, users, args.duration, args.think_time, args.single_flight, namespace=namespace)
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import numpy as np
+
+
+# -------------------------------
+# Function: Evaluate a Pinecone-style metadata filter
+# -------------------------------
+def matches_filter(metadata, flt):
+    """
+    Supports the subset of Pinecone's filter language used in this project:
+    equality, $eq/$ne/$in/$nin/$gt/$gte/$lt/$lte and $and/$or.
+    """
+    if not flt:
+        return True
+    for key, condition in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, c) for c in condition):
+                return False
+        else:
+            value = metadata.get(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, target in condition.items():
+                if not _compare(value, op, target):
+                    return False
+    return True
+
+
+def _compare(value, op, target):
+    if op == "$eq":
+        return value == target
+    if op == "$ne":
+        return value != target
+    if op == "$in":
+        return value in target
+    if op == "$nin":
+        return value not in target
+    if value is None:
+        return False
+    try:
+        value, target = float(value), float(target)
+    except (TypeError, ValueError):
+        return False
+    if op == "$gt":
+        return value > target
+    if op == "$gte":
+        return value >= target
+    if op == "$lt":
+        return value < target
+    if op == "$lte":
+        return value <= target
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+class _Namespace:
+    """Vectors of one namespace: a dense matrix plus ids and metadata in row order."""
+
+    def __init__(self, dimension):
+        self.ids = []
+        self.positions = {}
+        self.metadata = []
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+
+    def upsert(self, ids, values, metadata):
+        values = np.asarray(values, dtype=np.float32)
+        # Normalize once on write so query scores are plain dot products (cosine)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values = values / np.where(norms == 0, 1, norms)
+
+        new_rows = []
+        for vec_id, row, meta in zip(ids, values, metadata):
+            pos = self.positions.get(vec_id)
+            if pos is None:
+                self.positions[vec_id] = len(self.ids) + len(new_rows)
+                new_rows.append((vec_id, row, meta))
+            else:
+                self.matrix[pos] = row
+                self.metadata[pos] = meta
+        if new_rows:
+            self.ids.extend(r[0] for r in new_rows)
+            self.metadata.extend(r[2] for r in new_rows)
+            self.matrix = np.vstack([self.matrix, np.stack([r[1] for r in new_rows])])
+
+    def delete(self, ids):
+        drop = {self.positions[i] for i in ids if i in self.positions}
+        if not drop:
+            return
+        keep = [p for p in range(len(self.ids)) if p not in drop]
+        self.ids = [self.ids[p] for p in keep]
+        self.metadata = [self.metadata[p] for p in keep]
+        self.matrix = self.matrix[keep]
+        self.positions = {vec_id: p for p, vec_id in enumerate(self.ids)}
+
+
+# -------------------------------
+# Local index: in-process stand-in for a Pinecone index
+# -------------------------------
+class LocalIndex:
+    """
+    Brute-force cosine index held in memory. It exposes the same calls the app
+    makes on a Pinecone Index (upsert, query, fetch, list, delete,
+    describe_index_stats) so it can be used wherever a Pinecone index is expected.
+    """
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self.namespaces = {}
+
+    def _ns(self, namespace, create=False):
+        namespace = namespace or ""
+        if namespace not in self.namespaces:
+            if not create:
+                return None
+            self.namespaces[namespace] = _Namespace(self.dimension)
+        return self.namespaces[namespace]
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        if not vectors:
+            return {"upserted_count": 0}
+        ns = self._ns(namespace, create=True)
+        ns.upsert(
+            [v["id"] for v in vectors],
+            [v["values"] for v in vectors],
+            [dict(v.get("metadata") or {}) for v in vectors],
+        )
+        return {"upserted_count": len(vectors)}
+
+    def bulk_load(self, ids, values, metadata, namespace=None):
+        """Load parallel ids / (n, dimension) array / metadata list without building dicts."""
+        self._ns(namespace, create=True).upsert(ids, values, metadata)
+
+    def query(self, vector=None, top_k=10, include_metadata=False, include_values=False,
+              filter=None, namespace=None, id=None, **kwargs):
+        ns = self._ns(namespace)
+        if ns is None or not ns.ids:
+            return {"matches": [], "namespace": namespace or ""}
+        if vector is None:
+            vector = ns.matrix[ns.positions[id]]
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = ns.matrix @ query
+
+        if filter:
+            allowed = np.fromiter((matches_filter(m, filter) for m in ns.metadata), dtype=bool, count=len(ns.ids))
+            scores = np.where(allowed, scores, -np.inf)
+            top_k = min(top_k, int(allowed.sum()))
+        top_k = min(top_k, len(ns.ids))
+        if top_k <= 0:
+            return {"matches": [], "namespace": namespace or ""}
+
+        # argpartition keeps this O(n) for the candidate selection
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for pos in top:
+            match = {"id": ns.ids[pos], "score": float(scores[pos])}
+            if include_metadata:
+                match["metadata"] = ns.metadata[pos]
+            if include_values:
+                match["values"] = ns.matrix[pos].tolist()
+            matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        ns = self._ns(namespace)
+        vectors = {}
+        if ns is not None:
+            for vec_id in ids:
+                pos = ns.positions.get(vec_id)
+                if pos is not None:
+                    vectors[vec_id] = {
+                        "id": vec_id,
+                        "values": ns.matrix[pos].tolist(),
+                        "metadata": ns.metadata[pos],
+                    }
+        return {"vectors": vectors, "namespace": namespace or ""}
+
+    def list(self, prefix=None, limit=100, namespace=None, **kwargs):
+        """Yield pages of ids, like Index.list on a serverless Pinecone index."""
+        ns = self._ns(namespace)
+        if ns is None:
+            return
+        ids = [i for i in ns.ids if not prefix or i.startswith(prefix)]
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def delete(self, ids=None, delete_all=False, namespace=None, **kwargs):
+        namespace = namespace or ""
+        if delete_all:
+            self.namespaces.pop(namespace, None)
+        elif ids and namespace in self.namespaces:
+            self.namespaces[namespace].delete(ids)
+        return {}
+
+    def describe_index_stats(self, filter=None, **kwargs):
+        namespaces = {}
+        for name, ns in self.namespaces.items():
+            count = len(ns.ids) if not filter else sum(matches_filter(m, filter) for m in ns.metadata)
+            namespaces[name] = {"vector_count": count}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(n["vector_count"] for n in namespaces.values()),
+        }
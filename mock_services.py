@@ -0,0 +1,363 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from local_index import LocalIndex
+from simulated_backends import LatencyModel, hash_embedding
+
+COHERE_PORT = 8001
+PINECONE_PORT = 8002
+EMBED_DIMENSION = 1024  # embed-english-v3.0
+SECONDS_PER_1K_PROMPT_TOKENS = 0.15  # chat time to first token grows with the prompt
+SECONDS_PER_OUTPUT_TOKEN = 0.015  # streamed chat pacing
+RECORD_LINE = re.compile(r"^[A-Z][\w ]*: [^,]*, [A-Z][\w ]*: ")
+
+
+class FaultConfig:
+    """
+    What a mock service does to each request before answering it: a log-normal
+    delay, random 500s, random 429s and an optional requests-per-minute limit
+    (429 with Retry-After once exceeded).
+    """
+
+    def __init__(self, median_ms=50, p95_ms=150, error_rate=0.0, throttle_rate=0.0, requests_per_minute=None,
+                 seed=None):
+        self.latency = LatencyModel(median_ms / 1000, max(p95_ms, median_ms * 1.01) / 1000) if median_ms > 0 else None
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests_per_minute = requests_per_minute
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = []  # start times of the requests in the last minute
+
+    def delay(self):
+        if self.latency is not None:
+            self.latency.sleep()
+
+    def fault(self):
+        """(status, message) to fail the request with, or None to serve it."""
+        now = time.monotonic()
+        with self._lock:
+            if self.requests_per_minute:
+                self._window = [t for t in self._window if now - t < 60]
+                if len(self._window) >= self.requests_per_minute:
+                    return 429, "rate limit exceeded"
+                self._window.append(now)
+            roll = self._random.random()
+        if roll < self.throttle_rate:
+            return 429, "too many requests (injected)"
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, "internal server error (injected)"
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON request/response plumbing shared by the mock services."""
+
+    protocol_version = "HTTP/1.1"
+    routes = {}  # (method, path regex) -> handler method name
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.stats[f"{self.command} {self.route} {status}"] += 1
+
+    def _dispatch(self):
+        url = urlparse(self.path)
+        # Read the body even for rejected requests, or it would be parsed as the next one on this connection
+        body = self._body()
+        if url.path == "/_mock/stats":
+            self.route = url.path
+            return self.send_json(200, dict(self.server.stats))
+        for (method, pattern), name in self.routes.items():
+            match = re.fullmatch(pattern, url.path)
+            if method == self.command and match:
+                self.route = pattern
+                break
+        else:
+            self.route = url.path
+            return self.send_json(404, {"message": f"no route for {self.command} {url.path}"})
+
+        fault = self.server.faults.fault()
+        if fault:
+            status, message = fault
+            headers = {"Retry-After": "1"} if status == 429 else None
+            return self.send_json(status, {"message": message, "code": status}, headers)
+        self.server.faults.delay()
+        try:
+            getattr(self, name)(body, parse_qs(url.query), *match.groups())
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {"message": f"bad request: {e}", "code": 400})
+
+    do_GET = do_POST = _dispatch
+
+
+# -------------------------------
+# Mock Cohere API (v1 embed, chat, rerank)
+# -------------------------------
+class CohereHandler(_Handler):
+    """
+    Answers the Cohere v1 endpoints the app calls. Embeddings are deterministic
+    hashed bag-of-words vectors; chat answers quote the first records of the
+    prompt; rerank orders documents by embedding similarity.
+    """
+
+    routes = {
+        ("POST", r"/v1/embed"): "embed",
+        ("POST", r"/v1/chat"): "chat",
+        ("POST", r"/v1/rerank"): "rerank",
+    }
+
+    def embed(self, body, query):
+        texts = body["texts"]
+        vectors = [hash_embedding(t, self.server.dimension).tolist() for t in texts]
+        meta = {"api_version": {"version": "1"}, "billed_units": {"input_tokens": sum(len(t) // 4 + 1 for t in texts)}}
+        if body.get("embedding_types"):
+            embeddings = {kind: vectors for kind in body["embedding_types"]}
+            return self.send_json(200, {"response_type": "embeddings_by_type", "id": uuid.uuid4().hex,
+                                        "embeddings": embeddings, "texts": texts, "meta": meta})
+        self.send_json(200, {"response_type": "embeddings_floats", "id": uuid.uuid4().hex,
+                             "embeddings": vectors, "texts": texts, "meta": meta})
+
+    def _answer(self, message):
+        # Context lines look like "Farmer: fmr_1, County: ..." or "Summary of ..."
+        records = [line for line in message.splitlines() if RECORD_LINE.match(line) or line.startswith("Summary of")]
+        if not records:
+            return f"Mock answer to a {len(message.splitlines())}-line prompt."
+        quoted = "; ".join(r[:120] for r in records[:3])
+        return f"Based on {len(records)} records: {quoted}."
+
+    def chat(self, body, query):
+        message = body["message"]
+        # Time to first token grows with the prompt
+        time.sleep(len(message) / 4 / 1000 * SECONDS_PER_1K_PROMPT_TOKENS)
+        text = self._answer(message)
+        generation_id = uuid.uuid4().hex
+        response = {"text": text, "generation_id": generation_id, "finish_reason": "COMPLETE", "chat_history": [],
+                    "meta": {"billed_units": {"input_tokens": len(message) // 4 + 1, "output_tokens": len(text) // 4 + 1}}}
+        if not body.get("stream"):
+            return self.send_json(200, response)
+
+        # Streaming: one JSON event per line, like the v1 chat stream
+        self.send_response(200)
+        self.send_header("Content-Type", "application/stream+json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [{"event_type": "stream-start", "generation_id": generation_id, "is_finished": False}]
+        events += [{"event_type": "text-generation", "text": token, "is_finished": False}
+                   for token in re.findall(r"\S+\s*", text)]
+        events.append({"event_type": "stream-end", "finish_reason": "COMPLETE", "response": response,
+                       "is_finished": True})
+        try:
+            for event in events:
+                line = json.dumps(event).encode() + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+                if event["event_type"] == "text-generation":
+                    time.sleep(SECONDS_PER_OUTPUT_TOKEN)
+            self.wfile.write(b"0\r\n\r\n")
+            self.server.stats["POST /v1/chat stream 200"] += 1
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream (cancelled); stop generating
+            self.server.stats["POST /v1/chat stream closed"] += 1
+            self.close_connection = True
+
+    def rerank(self, body, query):
+        documents = [d if isinstance(d, str) else d.get("text", "") for d in body["documents"]]
+        q = hash_embedding(body["query"], self.server.dimension)
+        scores = np.array([float(hash_embedding(d, self.server.dimension) @ q) for d in documents])
+        order = np.argsort(-scores, kind="stable")[:body.get("top_n") or len(documents)]
+        results = [{"index": int(i), "relevance_score": round((scores[i] + 1) / 2, 6)} for i in order]
+        if body.get("return_documents"):
+            for r in results:
+                r["document"] = {"text": documents[r["index"]]}
+        self.send_json(200, {"id": uuid.uuid4().hex, "results": results,
+                             "meta": {"billed_units": {"search_units": 1}}})
+
+
+# -------------------------------
+# Mock Pinecone API (control plane + one index's data plane)
+# -------------------------------
+class PineconeHandler(_Handler):
+    """
+    Serves describe_index/list_indexes and the data-plane calls (query, upsert,
+    fetch, list, delete, describe_index_stats) of a single serverless index held
+    in a LocalIndex. Every index name resolves to it; its host is this server.
+    """
+
+    routes = {
+        ("GET", r"/indexes"): "list_indexes",
+        ("GET", r"/indexes/([^/]+)"): "describe_index",
+        ("POST", r"/query"): "query",
+        ("POST", r"/vectors/upsert"): "upsert",
+        ("GET", r"/vectors/fetch"): "fetch",
+        ("GET", r"/vectors/list"): "list_ids",
+        ("POST", r"/vectors/delete"): "delete",
+        ("POST", r"/describe_index_stats"): "describe_index_stats",
+        ("GET", r"/describe_index_stats"): "describe_index_stats",
+    }
+
+    def _description(self, name):
+        return {
+            "name": name, "dimension": self.server.index.dimension, "metric": "cosine",
+            "host": self.server.url, "vector_type": "dense", "deletion_protection": "disabled",
+            "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+            "status": {"ready": True, "state": "Ready"},
+        }
+
+    def list_indexes(self, body, query):
+        self.send_json(200, {"indexes": [self._description(self.server.index_name)]})
+
+    def describe_index(self, body, query, name):
+        self.send_json(200, self._description(name))
+
+    def query(self, body, query):
+        with self.server.lock:
+            result = self.server.index.query(
+                vector=body.get("vector"), id=body.get("id"), top_k=body.get("topK", 10),
+                include_metadata=body.get("includeMetadata", False), include_values=body.get("includeValues", False),
+                filter=body.get("filter"), namespace=body.get("namespace"),
+            )
+        for match in result["matches"]:
+            match.setdefault("values", [])
+        self.send_json(200, dict(result, usage={"readUnits": 5}))
+
+    def upsert(self, body, query):
+        vectors = body["vectors"]
+        if any(len(v["values"]) != self.server.index.dimension for v in vectors):
+            return self.send_json(400, {"message": f"Vector dimension does not match the dimension of the index "
+                                                   f"{self.server.index.dimension}", "code": 3})
+        with self.server.lock:
+            result = self.server.index.upsert(vectors, namespace=body.get("namespace"))
+        self.send_json(200, {"upsertedCount": result["upserted_count"]})
+
+    def fetch(self, body, query):
+        namespace = query.get("namespace", [""])[0]
+        with self.server.lock:
+            result = self.server.index.fetch(query.get("ids", []), namespace=namespace)
+        self.send_json(200, dict(result, usage={"readUnits": 1}))
+
+    def list_ids(self, body, query):
+        namespace = query.get("namespace", [""])[0]
+        prefix = query.get("prefix", [None])[0]
+        limit = int(query.get("limit", ["100"])[0])
+        start = int(query.get("paginationToken", ["0"])[0])
+        with self.server.lock:
+            ids = [i for page in self.server.index.list(prefix=prefix, limit=10 ** 9, namespace=namespace)
+                   for i in page]
+        page = ids[start:start + limit]
+        payload = {"vectors": [{"id": i} for i in page], "namespace": namespace, "usage": {"readUnits": 1}}
+        if start + limit < len(ids):
+            payload["pagination"] = {"next": str(start + limit)}
+        self.send_json(200, payload)
+
+    def delete(self, body, query):
+        with self.server.lock:
+            self.server.index.delete(ids=body.get("ids"), delete_all=body.get("deleteAll", False),
+                                     namespace=body.get("namespace"))
+        self.send_json(200, {})
+
+    def describe_index_stats(self, body, query):
+        with self.server.lock:
+            stats = self.server.index.describe_index_stats(filter=body.get("filter"))
+        self.send_json(200, {
+            "namespaces": {name: {"vectorCount": ns["vector_count"]} for name, ns in stats["namespaces"].items()},
+            "dimension": stats["dimension"],
+            "indexFullness": 0.0,
+            "totalVectorCount": stats["total_vector_count"],
+        })
+
+
+def _serve(handler, port, faults, verbose=False, **attributes):
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.faults = faults
+    server.verbose = verbose
+    server.stats = Counter()
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    for name, value in attributes.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True, name=handler.__name__).start()
+    return server
+
+
+# -------------------------------
+# Function: Start the mock services
+# -------------------------------
+def start_mock_services(cohere_port=COHERE_PORT, pinecone_port=PINECONE_PORT, faults=None, index=None,
+                        index_name="corn-data", dimension=EMBED_DIMENSION, verbose=False):
+    """
+    Starts the Cohere and Pinecone mocks on background threads (port 0 picks a
+    free port) and returns (cohere_server, pinecone_server); their .url is the
+    CO_API_URL / PINECONE_CONTROLLER_HOST to use. faults (a FaultConfig) applies
+    to both; index, a LocalIndex, is served instead of an empty one.
+    """
+    faults = faults or FaultConfig()
+    cohere_server = _serve(CohereHandler, cohere_port, faults, verbose, dimension=dimension)
+    pinecone_server = _serve(PineconeHandler, pinecone_port, faults, verbose,
+                             index=index or LocalIndex(dimension), index_name=index_name)
+    return cohere_server, pinecone_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-ins for the Cohere and Pinecone HTTP APIs")
+    parser.add_argument("--cohere-port", type=int, default=COHERE_PORT)
+    parser.add_argument("--pinecone-port", type=int, default=PINECONE_PORT)
+    parser.add_argument("--snapshot", help="serve this index snapshot (index_snapshot.py export) instead of an empty index")
+    parser.add_argument("--dimension", type=int, default=EMBED_DIMENSION, help="embedding/index dimension")
+    parser.add_argument("--latency-ms", type=float, default=50, help="median added latency per request")
+    parser.add_argument("--latency-p95-ms", type=float, default=150, help="p95 added latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failing with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests rejected with 429")
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute before every request gets 429")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the injected faults")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+
+    index = None
+    if args.snapshot:
+        from index_snapshot import load_local_index
+        index = load_local_index(args.snapshot)
+    faults = FaultConfig(args.latency_ms, args.latency_p95_ms, args.error_rate, args.throttle_rate, args.rpm,
+                         args.seed)
+    cohere_server, pinecone_server = start_mock_services(args.cohere_port, args.pinecone_port, faults, index,
+                                                         dimension=index.dimension if index else args.dimension,
+                                                         verbose=args.verbose)
+    print("Mock services running; point the app at them with:")
+    print(f"  export CO_API_URL={cohere_server.url}")
+    print(f"  export PINECONE_CONTROLLER_HOST={pinecone_server.url}")
+    print("  export COHERE_API_KEY=mock PINECONE_API_KEY=mock PINECONE_INDEX_NAME=corn-data")
+    print(f"Request counts: {cohere_server.url}/_mock/stats, {pinecone_server.url}/_mock/stats")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from concurrent.futures import CancelledError
+
+from diversity import select_context
+from generation import format_records, generate_answer
+from retrieval import RetrievalResult, classify_query, retrieve
+
+EMBED_MODEL = "embed-english-v3.0"
+
+# Sort type -> metadata field the retrieved rows are ordered by
+SORT_FIELDS = {"yield": "yield", "acreage": "acreage", "fertilizer": "fertilizer_amount"}
+
+
+class PipelineResult:
+    """Everything the dashboard shows for one answered question."""
+
+    def __init__(self, answer_text, records, sort_type, retrieval, map_calls):
+        self.answer_text = answer_text
+        self.records = records
+        self.sort_type = sort_type
+        self.retrieval = retrieval
+        self.map_calls = map_calls
+
+
+def embed_query(co, query):
+    response = co.embed(
+        texts=[query],
+        model=EMBED_MODEL,
+        input_type="search_query",
+        embedding_types=["float"]
+    )
+    return response.embeddings.float[0]
+
+
+def sort_records(records, sort_type):
+    """Order records by the sort field, or keep relevance order."""
+    field = SORT_FIELDS.get(sort_type)
+    if field is None:
+        return records
+    return records.sort_by(field)
+
+
+def prepare_retrieval(co, index, query, geo=None, namespace=None, router=None, cancelled=None):
+    """
+    Embed -> route -> retrieve, the part of answering that doesn't depend on the
+    conversation. Returns (plan, retrieval), or None when cancelled() turns true
+    between the embed and the retrieval.
+    """
+    query_embedding = embed_query(co, query)
+    if cancelled and cancelled():
+        return None
+    plan = router.route(query, query_embedding) if router else classify_query(query)
+    # Start with a small top_k for the query class and only expand when the result looks incomplete
+    retrieval = retrieve(index, query_embedding, plan, query=query, namespace=namespace, geo=geo)
+    return plan, retrieval
+
+
+# -------------------------------
+# Function: Answer one question end to end
+# -------------------------------
+def run_pipeline(co, index, query, chat_history=None, refined=None, geo=None, namespace=None, router=None,
+                 prepared=None, cancelled=None, progress=None):
+    """
+    Embed -> route -> retrieve -> sort -> generate. refined, a (records, filter) pair
+    from ConversationState.refine, replaces the embed and retrieve steps; so does
+    prepared, a (plan, retrieval) pair from prepare_retrieval run ahead of time.
+    geo, a GeoIndex over the rows, enables location questions; namespace selects
+    the data version's vectors. router, an IntentRouter, plans the question from
+    its embedding; without one (or for refinements) the keyword rules do.
+    Lookup and general questions answer from an MMR-diversified subset of the
+    retrieved rows (see diversity.select_context).
+
+    For background runs: cancelled() is checked between the stages (and between
+    chat calls), raising CancelledError once it turns true; progress(stage, **partial)
+    is told when retrieval starts, when the context records are known and as the
+    answer text streams in.
+    """
+    def report(stage, **partial):
+        if progress:
+            progress(stage, **partial)
+
+    report("retrieving")
+    if refined is not None:
+        plan = classify_query(query)
+        retrieval = RetrievalResult(refined[0], top_k=len(refined[0]), pages=0,
+                                    metadata_filter=refined[1], query_class=plan.query_class)
+    elif prepared is not None:
+        plan, retrieval = prepared
+    else:
+        prepared = prepare_retrieval(co, index, query, geo, namespace, router, cancelled)
+        if prepared is None:
+            raise CancelledError()
+        plan, retrieval = prepared
+
+    # Summary documents are already the answer's building blocks; keep them in relevance order
+    sort_type = plan.sort_type if retrieval.query_class != "aggregate" else "relevance"
+    # Similarity questions send a diverse, token-bounded subset instead of near-duplicate rows
+    records = retrieval.records if refined is not None else select_context(retrieval.records, retrieval.query_class)
+    records = sort_records(records, sort_type)
+    report("generating", retrieval=retrieval, records=records, sort_type=sort_type)
+
+    # Map-reduce over chunks when the records don't fit one prompt
+    context_texts = format_records(records)
+    on_text = (lambda text: report("generating", answer_text=text)) if progress else None
+    answer_text, map_calls = generate_answer(co, query, context_texts, chat_history=chat_history,
+                                             cancelled=cancelled, on_text=on_text)
+    return PipelineResult(answer_text, records, sort_type, retrieval, map_calls)
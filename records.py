@@ -0,0 +1,218 @@
+import numpy as np
+
+# Metadata fields stored as strings in the index but compared and sorted as numbers
+NUMERIC_FIELDS = ["yield", "acreage", "fertilizer_amount", "laborers", "household_size",
+                  "latitude", "longitude"]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class Categorical:
+    """Interned string column: int32 codes into a list of distinct values (-1 = missing)."""
+
+    __slots__ = ("codes", "categories")
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_values(cls, values):
+        lookup, categories = {}, []
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(categories)
+                categories.append(value)
+            codes[i] = code
+        return cls(codes, categories)
+
+    def take(self, positions):
+        return Categorical(self.codes[positions], self.categories)
+
+    def value(self, i):
+        code = self.codes[i]
+        return self.categories[code] if code >= 0 else None
+
+    def values(self):
+        lookup = np.array(self.categories + [None], dtype=object)
+        return lookup[self.codes]
+
+    def mask(self, op, target):
+        if op in ("$eq", "$ne"):
+            code = self.categories.index(target) if target in self.categories else -2
+            hit = self.codes == code
+            return hit if op == "$eq" else ~hit
+        if op in ("$in", "$nin"):
+            codes = [self.categories.index(t) for t in target if t in self.categories]
+            hit = np.isin(self.codes, codes)
+            return hit if op == "$in" else ~hit
+        # Range operators on a string column compare numerically where possible
+        return _numeric_mask(np.array([_to_float(v) for v in self.values()]), op, target)
+
+
+def _numeric_mask(values, op, target):
+    if op == "$eq":
+        return values == float(target)
+    if op == "$ne":
+        return values != float(target)
+    if op == "$in":
+        return np.isin(values, [float(t) for t in target])
+    if op == "$nin":
+        return ~np.isin(values, [float(t) for t in target])
+    target = float(target)
+    # Comparisons with NaN (missing values) are False, like Pinecone's missing fields
+    if op == "$gt":
+        return values > target
+    if op == "$gte":
+        return values >= target
+    if op == "$lt":
+        return values < target
+    if op == "$lte":
+        return values <= target
+    raise ValueError(f"Unsupported filter operator: {op}")
+
+
+# -------------------------------
+# RecordSet: columnar retrieval results
+# -------------------------------
+class RecordSet:
+    """
+    Retrieved matches held column by column: ids, float32 scores, float64 arrays for
+    numeric fields (NaN when missing) and interned Categorical columns for strings.
+    Sorting, filtering and taking subsets work on whole arrays.
+    """
+
+    __slots__ = ("ids", "scores", "numeric", "raw_numeric", "categorical")
+
+    def __init__(self, ids, scores, numeric, raw_numeric, categorical):
+        self.ids = ids
+        self.scores = scores
+        self.numeric = numeric
+        # Original strings of the numeric fields, so display shows "0.25" not 0.25000
+        self.raw_numeric = raw_numeric
+        self.categorical = categorical
+
+    @classmethod
+    def from_matches(cls, matches):
+        ids = np.array([m['id'] for m in matches], dtype=object)
+        scores = np.array([m.get('score', 0.0) for m in matches], dtype=np.float32)
+        metas = [m.get('metadata') or {} for m in matches]
+        keys = sorted({k for meta in metas for k in meta})
+
+        numeric, raw_numeric, categorical = {}, {}, {}
+        for key in keys:
+            column = [meta.get(key) for meta in metas]
+            if key in NUMERIC_FIELDS:
+                numeric[key] = np.array([_to_float(v) for v in column], dtype=np.float64)
+                raw_numeric[key] = Categorical.from_values(column)
+            else:
+                # Lists (e.g. a summary's top_farmers) are interned as tuples
+                categorical[key] = Categorical.from_values(
+                    [tuple(v) if isinstance(v, list) else v for v in column]
+                )
+        return cls(ids, scores, numeric, raw_numeric, categorical)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_matches([])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def fields(self):
+        return list(self.numeric) + list(self.categorical)
+
+    def take(self, positions):
+        positions = np.asarray(positions, dtype=np.intp)
+        return RecordSet(
+            self.ids[positions],
+            self.scores[positions],
+            {k: v[positions] for k, v in self.numeric.items()},
+            {k: v.take(positions) for k, v in self.raw_numeric.items()},
+            {k: v.take(positions) for k, v in self.categorical.items()},
+        )
+
+    def head(self, n):
+        return self.take(np.arange(min(n, len(self))))
+
+    def sort_by(self, field, descending=True):
+        """Stable sort by a numeric field; missing values go last."""
+        values = self.numeric.get(field)
+        if values is None:
+            return self
+        keys = np.where(np.isnan(values), -np.inf if descending else np.inf, values)
+        order = np.argsort(-keys if descending else keys, kind="stable")
+        return self.take(order)
+
+    def mask(self, metadata_filter):
+        """Boolean array of the records matching a Pinecone-style filter."""
+        result = np.ones(len(self), dtype=bool)
+        if not metadata_filter:
+            return result
+        for key, condition in metadata_filter.items():
+            if key == "$and":
+                for sub in condition:
+                    result &= self.mask(sub)
+            elif key == "$or":
+                result &= np.logical_or.reduce([self.mask(sub) for sub in condition]) if condition else False
+            else:
+                if not isinstance(condition, dict):
+                    condition = {"$eq": condition}
+                for op, target in condition.items():
+                    if key in self.numeric and op not in ("$eq", "$ne", "$in", "$nin"):
+                        result &= _numeric_mask(self.numeric[key], op, target)
+                    elif key in self.raw_numeric:
+                        result &= self.raw_numeric[key].mask(op, target)
+                    elif key in self.categorical:
+                        result &= self.categorical[key].mask(op, target)
+                    else:
+                        # Field absent from every record
+                        result &= op in ("$ne", "$nin")
+        return result
+
+    def filter(self, metadata_filter):
+        return self.take(np.flatnonzero(self.mask(metadata_filter)))
+
+    def distinct(self, field):
+        """Distinct non-missing values of a string field."""
+        column = self.categorical.get(field)
+        if column is None:
+            return []
+        present = np.unique(column.codes[column.codes >= 0])
+        return [column.categories[c] for c in present]
+
+    def column(self, field, default=None):
+        """Object array of a field's original values (default where missing)."""
+        column = self.raw_numeric.get(field) or self.categorical.get(field)
+        if column is None:
+            return np.full(len(self), default, dtype=object)
+        values = column.values()
+        if default is not None:
+            values[values == None] = default  # noqa: E711 (elementwise comparison)
+        return values
+
+    def metadata(self, i):
+        """Metadata dict of one record, for display."""
+        meta = {}
+        for key, column in list(self.raw_numeric.items()) + list(self.categorical.items()):
+            value = column.value(i)
+            if value is not None:
+                meta[key] = list(value) if isinstance(value, tuple) else value
+        return meta
+
+    def to_matches(self):
+        """Pinecone-style match dicts (ids, scores, metadata)."""
+        return [
+            {"id": self.ids[i], "score": float(self.scores[i]), "metadata": self.metadata(i)}
+            for i in range(len(self))
+        ]
@@ -0,0 +1,385 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Latency samples kept per call for the hedge delay and the reported percentiles
+LATENCY_WINDOW = 200
+# Samples needed before the observed p95 replaces a policy's initial hedge delay
+MIN_HEDGE_SAMPLES = 20
+
+
+class UpstreamError(RuntimeError):
+    """Base class for calls the resilience layer gave up on."""
+
+
+class UpstreamTimeout(UpstreamError, TimeoutError):
+    """The call (including any hedge) did not finish before its deadline."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The upstream's breaker is open; the call was not attempted."""
+
+
+# Exception class names of the HTTP libraries under the clients (httpx, urllib3) that mean
+# the request never got a response
+TRANSPORT_ERROR_WORDS = ("Timeout", "Connect", "Protocol", "MaxRetry")
+
+
+def is_upstream_failure(error):
+    """
+    True for errors that say the upstream is unhealthy: timeouts, connection
+    failures, 5xx and 429 responses. Other errors (4xx, validation, an expected
+    "not supported") are the caller's and don't count against the breaker.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    # Cohere errors carry status_code, Pinecone's status
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(word in type(error).__name__ for word in TRANSPORT_ERROR_WORDS)
+
+
+class CallPolicy:
+    """
+    How one client method is called: deadline in seconds, whether a duplicate
+    request may be sent (idempotent calls only), and the hedge delay used before
+    enough latencies have been observed to take their p95.
+    """
+
+    def __init__(self, timeout, hedge=False, hedge_after=1.0):
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+
+
+class StreamPolicy(CallPolicy):
+    """
+    How a method returning an event stream is called: a deadline for the first
+    token (events named in preamble_events, sent before generation starts, don't
+    count) and one for the whole stream. Streams are never hedged.
+    """
+
+    def __init__(self, first_token_timeout, timeout, preamble_events=("stream-start",)):
+        super().__init__(timeout)
+        self.first_token_timeout = first_token_timeout
+        self.preamble_events = preamble_events
+
+
+# Defaults for the calls the app makes; chat is not idempotent-cheap enough to hedge
+COHERE_POLICIES = {
+    "embed": CallPolicy(timeout=10.0, hedge=True, hedge_after=1.0),
+    "chat": CallPolicy(timeout=60.0),
+    "chat_stream": StreamPolicy(first_token_timeout=60.0, timeout=120.0),
+}
+# Ingestion embeds 20-document batches under its own breaker: hedging them would spend
+# the trial rate limit the batch delay protects, so they only get a longer deadline
+INGEST_COHERE_POLICIES = {
+    "embed": CallPolicy(timeout=60.0),
+}
+INDEX_POLICIES = {
+    "query": CallPolicy(timeout=10.0, hedge=True, hedge_after=0.5),
+    "describe_index_stats": CallPolicy(timeout=5.0, hedge=True, hedge_after=0.5),
+}
+
+
+# -------------------------------
+# Circuit breaker
+# -------------------------------
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets a single trial call through (half-open),
+    closing again on success and re-opening on failure.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                self.trial_in_flight = False
+            if self.state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != "closed":
+                logger.info("circuit %s closed", self.name)
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def release(self):
+        """A call ended without a verdict on the upstream (stopped by the caller, a client error): free the half-open trial."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("circuit %s opened after %d failures", self.name, self.failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class CallMetrics:
+    """Counters and a rolling latency window for one upstream method."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.short_circuited = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latencies = []
+
+    def observe(self, seconds):
+        with self.lock:
+            self.latencies.append(seconds)
+            del self.latencies[:-LATENCY_WINDOW]
+
+    def count(self, name, n=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def p95(self):
+        with self.lock:
+            if len(self.latencies) < MIN_HEDGE_SAMPLES:
+                return None
+            return float(np.percentile(self.latencies, 95))
+
+    def snapshot(self):
+        with self.lock:
+            latencies = list(self.latencies)
+            snap = {k: getattr(self, k) for k in
+                    ("calls", "successes", "failures", "timeouts", "short_circuited", "hedges", "hedge_wins")}
+        if latencies:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            snap["latency_ms"] = {"p50": round(p50 * 1000, 1), "p95": round(p95 * 1000, 1), "p99": round(p99 * 1000, 1)}
+        else:
+            snap["latency_ms"] = {"p50": None, "p95": None, "p99": None}
+        return snap
+
+
+# -------------------------------
+# Resilient client proxy
+# -------------------------------
+class ResilientClient:
+    """
+    Wraps a Cohere client or a Pinecone index. Methods named in `policies` run on a
+    worker pool with a deadline, an optional hedged duplicate after the observed p95
+    (or the policy's hedge_after) and a circuit breaker shared by the whole upstream
+    (only timeouts, connection errors, 5xx and 429 count as its failures); other
+    attributes pass straight through. Streaming methods (StreamPolicy) are
+    read on the pool and handed over event by event under their two deadlines.
+
+    A timed-out attempt keeps running on its worker thread (Python threads can't be
+    interrupted); its result is discarded.
+    """
+
+    def __init__(self, target, name, policies, breaker=None, max_workers=16):
+        self._target = target
+        self._name = name
+        self._policies = policies
+        self.breaker = breaker or CircuitBreaker(name)
+        self.metrics = {method: CallMetrics() for method in policies}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-call")
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        policy = self._policies.get(name)
+        if policy is None or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if isinstance(policy, StreamPolicy):
+                return self._stream(name, policy, attr, args, kwargs)
+            return self._call(name, policy, attr, args, kwargs)
+        return call
+
+    def __getitem__(self, key):
+        return self._target[key]
+
+    def _attempt(self, metrics, fn, args, kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        metrics.observe(time.perf_counter() - start)
+        return result
+
+    def _call(self, method, policy, fn, args, kwargs):
+        metrics = self.metrics[method]
+        label = f"{self._name}.{method}"
+        metrics.count("calls")
+        if not self.breaker.allow():
+            metrics.count("short_circuited")
+            raise CircuitOpenError(f"{label}: circuit open, upstream degraded")
+
+        deadline = time.monotonic() + policy.timeout
+        pending = {self._pool.submit(self._attempt, metrics, fn, args, kwargs)}
+        hedged = None
+        error = None
+
+        if policy.hedge:
+            hedge_after = metrics.p95() or policy.hedge_after
+            done, pending = wait(pending, timeout=min(hedge_after, policy.timeout))
+            if not done:
+                metrics.count("hedges")
+                logger.info("%s: hedging after %.0f ms", label, hedge_after * 1000)
+                hedged = self._pool.submit(self._attempt, metrics, fn, args, kwargs)
+                pending.add(hedged)
+            else:
+                pending = done
+
+        # First successful attempt wins; a failed attempt waits for its sibling
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is hedged:
+                        metrics.count("hedge_wins")
+                    metrics.count("successes")
+                    self.breaker.record_success()
+                    return future.result()
+                error = future.exception()
+
+        if error is not None and not pending:
+            metrics.count("failures")
+            if is_upstream_failure(error):
+                logger.warning("%s failed: %s", label, error)
+                self.breaker.record_failure()
+            else:
+                logger.info("%s rejected: %s", label, error)
+                self.breaker.release()
+            raise error
+        self.breaker.record_failure()
+        metrics.count("timeouts")
+        logger.warning("%s timed out after %.1f s", label, policy.timeout)
+        raise UpstreamTimeout(f"{label}: no response within {policy.timeout:.1f} s")
+
+    def _stream(self, method, policy, fn, args, kwargs):
+        """
+        Starts the stream on a worker and returns a generator of its events. Latency
+        is the time to the first token. Closing the generator stops reading (the
+        worker closes the upstream stream after its next event).
+        """
+        metrics = self.metrics[method]
+        label = f"{self._name}.{method}"
+        metrics.count("calls")
+        if not self.breaker.allow():
+            metrics.count("short_circuited")
+            raise CircuitOpenError(f"{label}: circuit open, upstream degraded")
+
+        events = queue.Queue()
+        closed = threading.Event()
+
+        def pump():
+            stream = None
+            try:
+                stream = fn(*args, **kwargs)
+                for event in stream:
+                    if closed.is_set():
+                        break
+                    events.put(("event", event))
+                events.put(("end", None))
+            except Exception as e:
+                events.put(("error", e))
+            finally:
+                close = getattr(stream, "close", None)
+                if closed.is_set() and close:
+                    close()
+
+        start = time.monotonic()
+        self._pool.submit(pump)
+
+        def read():
+            first_token_at = start + policy.first_token_timeout
+            deadline = start + policy.timeout
+            got_token = False
+            verdict = False
+            try:
+                while True:
+                    limit = deadline if got_token else min(first_token_at, deadline)
+                    try:
+                        kind, item = events.get(timeout=max(limit - time.monotonic(), 0))
+                    except queue.Empty:
+                        verdict = True
+                        self.breaker.record_failure()
+                        metrics.count("timeouts")
+                        waited = "first token" if not got_token else "end of stream"
+                        logger.warning("%s: no %s within %.1f s", label, waited, limit - start)
+                        raise UpstreamTimeout(f"{label}: no {waited} within {limit - start:.1f} s")
+                    if kind == "error":
+                        verdict = True
+                        metrics.count("failures")
+                        if is_upstream_failure(item):
+                            logger.warning("%s failed: %s", label, item)
+                            self.breaker.record_failure()
+                        else:
+                            logger.info("%s rejected: %s", label, item)
+                            self.breaker.release()
+                        raise item
+                    if kind == "end":
+                        verdict = True
+                        metrics.count("successes")
+                        self.breaker.record_success()
+                        return
+                    if not got_token and getattr(item, "event_type", None) not in policy.preamble_events:
+                        got_token = True
+                        metrics.observe(time.monotonic() - start)
+                    yield item
+            finally:
+                closed.set()
+                if not verdict:
+                    # Stopped by the caller: a stream that was answering counts as healthy
+                    if got_token:
+                        self.breaker.record_success()
+                    else:
+                        self.breaker.release()
+        return read()
+
+    def metrics_snapshot(self):
+        return {
+            "circuit": self.breaker.state,
+            "calls": {method: m.snapshot() for method, m in self.metrics.items()},
+        }
+
+
+def resilient_cohere(co, policies=None, **kwargs):
+    return ResilientClient(co, "cohere", policies or COHERE_POLICIES, **kwargs)
+
+
+def ingest_cohere(co, **kwargs):
+    """Cohere client for background ingestion, with its own breaker and metrics."""
+    return ResilientClient(co, "cohere-ingest", INGEST_COHERE_POLICIES, **kwargs)
+
+
+def resilient_index(index, policies=None, **kwargs):
+    return ResilientClient(index, "index", policies or INDEX_POLICIES, **kwargs)
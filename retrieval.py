@@ -0,0 +1,310 @@
+import re
+
+import numpy as np
+
+from geo_index import parse_location
+from records import RecordSet
+
+# Keyword lists used to pick the field retrieved rows are sorted by
+SORT_KEYWORDS = {
+    "yield": ['yield', 'harvest', 'production', 'bushels', 'most corn', 'highest production'],
+    "acreage": ['acreage', 'acres', 'land', 'farm size'],
+    "fertilizer": ['fertilizer', 'chemicals', 'inputs'],
+}
+
+# Questions answered from the precomputed group summaries rather than individual rows
+AGGREGATE_KEYWORDS = ['average', 'mean', 'total', 'breakdown', 'distribution', 'per county', 'by county',
+                      'how many', 'number of', 'percentage', 'proportion', 'share of', 'summary', 'overall']
+# Words that name a summary grouping, mapped to its group_by value
+GROUP_KEYWORDS = {
+    'county': 'county', 'counties': 'county', 'education': 'education', 'gender': 'gender',
+    'men': 'gender', 'women': 'gender', 'age': 'age_bracket', 'water': 'water_source',
+    'power': 'power_source',
+}
+# Questions that compare values across the whole dataset (or a filtered part of it)
+RANKING_KEYWORDS = ['highest', 'lowest', 'most', 'least', 'top', 'best', 'worst', 'largest',
+                    'smallest', 'biggest', 'rank', 'compare', 'maximum', 'minimum']
+# Questions that want every row matching some criteria
+LISTING_KEYWORDS = ['list', 'all ', 'which farmers', 'show me', 'how many', 'who ']
+FARMER_ID_PATTERN = re.compile(r"\bfmr_\d+\b", re.IGNORECASE)
+
+# (initial top_k, maximum top_k) per query class
+TOP_K_BY_CLASS = {
+    "lookup": (5, 20),
+    "aggregate": (3, 50),
+    "general": (20, 100),
+    "listing": (50, 1000),
+    "ranking": (50, 1000),
+}
+
+# Questions answered from filtered/sorted rows or summaries ("structured") versus
+# from the passages most similar to the question ("rag")
+PATH_BY_CLASS = {
+    "lookup": "rag",
+    "general": "rag",
+    "aggregate": "structured",
+    "listing": "structured",
+    "ranking": "structured",
+}
+
+# Categorical metadata fields a question can filter on by naming one of their values
+FILTER_FIELDS = ['county', 'crop', 'education', 'gender', 'age_bracket', 'water_source', 'power_source',
+                 'credit_source', 'advisory_source', 'extension_provider', 'advisory_format',
+                 'advisory_language']
+
+# Row vectors and summary documents share the index; doc_type tells them apart
+ROW_FILTER = {"doc_type": {"$eq": "row"}}
+SUMMARY_FILTER = {"doc_type": {"$eq": "summary"}}
+GROUP_FILTER = {"doc_type": {"$eq": "group"}}
+
+# Level-one groups searched by hierarchical retrieval, and the classes that use it; a
+# lookup names one farm, which is often outside the areas most similar to the question
+HIERARCHICAL_GROUPS = 3
+HIERARCHICAL_CLASSES = ("general",)
+
+# Most rows a location question retrieves (Pinecone's top_k limit with metadata)
+MAX_SPATIAL_TOP_K = 1000
+
+
+class QueryPlan:
+    """How a question should be retrieved: its class, path, top_k bounds and sort field."""
+
+    def __init__(self, query_class, sort_type="relevance"):
+        self.query_class = query_class
+        self.sort_type = sort_type
+        self.path = PATH_BY_CLASS[query_class]
+        self.initial_top_k, self.max_top_k = TOP_K_BY_CLASS[query_class]
+
+
+class RetrievalResult:
+    """Records returned by retrieve() (a columnar RecordSet) plus how they were obtained."""
+
+    def __init__(self, records, top_k, pages, metadata_filter=None, query_class=None, location=None):
+        self.records = records
+        self.query_class = query_class
+        self.top_k = top_k
+        self.pages = pages
+        self.metadata_filter = metadata_filter
+        # (lat, lon, radius_km, label) when the rows were selected by distance
+        self.location = location
+
+
+# -------------------------------
+# Function: Classify a question
+# -------------------------------
+def classify_query(query):
+    """Chooses the query class (and so the starting top_k) and the sort field from keywords."""
+    query_lower = query.lower()
+
+    sort_type = "relevance"
+    for field, keywords in SORT_KEYWORDS.items():
+        if any(keyword in query_lower for keyword in keywords):
+            sort_type = field
+            break
+
+    if FARMER_ID_PATTERN.search(query):
+        query_class = "lookup"
+    elif any(keyword in query_lower for keyword in AGGREGATE_KEYWORDS):
+        query_class = "aggregate"
+    elif any(keyword in query_lower for keyword in RANKING_KEYWORDS):
+        query_class = "ranking"
+    elif any(keyword in query_lower for keyword in LISTING_KEYWORDS):
+        query_class = "listing"
+    else:
+        query_class = "general"
+    return QueryPlan(query_class, sort_type)
+
+
+# -------------------------------
+# Function: Derive a metadata filter from the question
+# -------------------------------
+def derive_filter(query, records):
+    """
+    Builds a Pinecone filter from categorical values (seen in a RecordSet, e.g. the
+    first page of matches) that the question names, e.g. "female farmers using solar power".
+    """
+    query_lower = query.lower()
+    conditions = []
+    for field in FILTER_FIELDS:
+        values = records.distinct(field)
+        named = sorted(
+            v for v in values
+            # Short values ("No", "Yes") are too ambiguous to match in free text
+            if v and len(v) >= 4 and re.search(rf"\b{re.escape(v.lower())}\b", query_lower)
+        )
+        if len(named) == 1:
+            conditions.append({field: {"$eq": named[0]}})
+        elif named:
+            conditions.append({field: {"$in": named}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def combine_filters(*filters):
+    """AND together the given filters, skipping empty ones."""
+    filters = [f for f in filters if f]
+    if not filters:
+        return None
+    return filters[0] if len(filters) == 1 else {"$and": filters}
+
+
+def summary_filter(query):
+    """Summary filter, narrowed to the groupings (education, gender, ...) the question names."""
+    words = set(re.findall(r"[a-z]+", query.lower()))
+    group_by = sorted({g for word, g in GROUP_KEYWORDS.items() if word in words})
+    if not group_by:
+        return SUMMARY_FILTER, False
+    return combine_filters(SUMMARY_FILTER, {"group_by": {"$in": group_by}}), True
+
+
+def estimate_count(index, metadata_filter=None, namespace=None):
+    """Number of vectors matching the filter, or None if the index can't tell us."""
+    try:
+        kwargs = {"filter": metadata_filter} if metadata_filter else {}
+        stats = index.describe_index_stats(**kwargs)
+        if namespace:
+            return stats["namespaces"].get(namespace, {}).get("vector_count", 0)
+        return stats["total_vector_count"]
+    except Exception:
+        # Serverless indexes don't support filtered stats
+        return None
+
+
+def holds_untyped_rows(index, query_embedding, namespace=None):
+    """
+    True when the namespace's vectors carry no doc_type, i.e. it was built before
+    summaries existed and every vector is a row.
+    """
+    kwargs = {"namespace": namespace} if namespace else {}
+    probe = index.query(vector=query_embedding, top_k=1, include_metadata=True, **kwargs)['matches']
+    return bool(probe) and "doc_type" not in (probe[0].get('metadata') or {})
+
+
+def is_sufficient(matches, top_k, min_drop=0.08):
+    """
+    Score-gap heuristic: the result is complete when the index ran out of
+    matches, or when the tail scores have clearly dropped below the head.
+    """
+    if len(matches) < top_k:
+        return True
+    return matches[0]['score'] - matches[-1]['score'] >= min_drop
+
+
+def _retrieve_near(run, geo, plan, query, location):
+    """
+    Rows within the radius, selected by their keys in the geo index and further
+    narrowed by any categorical values the question names; nearest first unless
+    the question asks for a sort.
+    """
+    lat, lon, radius_km, _ = location
+    positions, _ = geo.radius(lat, lon, radius_km)
+    positions = positions[:MAX_SPATIAL_TOP_K]
+    if not len(positions):
+        return RetrievalResult(RecordSet.empty(), 0, 0, None, plan.query_class, location)
+
+    spatial_filter = geo.key_filter(positions)
+    records = RecordSet.from_matches(run(len(positions), spatial_filter))
+    extra_filter = derive_filter(query, records)
+    if extra_filter:
+        records = records.filter(extra_filter)
+
+    # Similarity order means little here; order by distance instead
+    rank = {str(k): r for r, k in enumerate(geo.keys[positions])}
+    order = np.argsort([rank.get(str(k), len(rank)) for k in records.column("farmer")], kind="stable")
+    records = records.take(order)
+    return RetrievalResult(records, len(positions), 1, combine_filters(spatial_filter, extra_filter),
+                           plan.query_class, location)
+
+
+# -------------------------------
+# Function: Retrieve with adaptive top_k
+# -------------------------------
+def retrieve(index, query_embedding, plan, query="", namespace=None, hierarchical=True, geo=None):
+    """
+    Starts with the plan's small top_k and only asks for more when the result looks
+    incomplete. Ranking and listing questions that need every row in scope size
+    top_k from the (filtered) vector count instead of paging up to it.
+    General questions first pick the best level-one area documents and then
+    search only the rows inside those areas; lookups naming farmer ids filter
+    on those ids.
+    With a GeoIndex, questions naming a location ("near Voi", "within 20 km of
+    -3.4, 38.4") retrieve the rows inside that radius.
+    """
+    # Cleared when the namespace turns out to predate doc_type, so rows are queried unfiltered
+    typed = [True]
+
+    def run(top_k, metadata_filter=None, doc_filter=ROW_FILTER):
+        row_query = doc_filter is ROW_FILTER
+        kwargs = {"namespace": namespace} if namespace else {}
+        kwargs["filter"] = combine_filters(doc_filter if typed[0] or not row_query else None, metadata_filter)
+        matches = index.query(vector=query_embedding, top_k=top_k, include_metadata=True, **kwargs)['matches']
+        if not matches and row_query and typed[0] and holds_untyped_rows(index, query_embedding, namespace):
+            typed[0] = False
+            return run(top_k, metadata_filter)
+        return matches
+
+    location = parse_location(query) if geo is not None else None
+    if location:
+        return _retrieve_near(run, geo, plan, query, location)
+
+    if plan.query_class == "aggregate":
+        # A handful of summary documents answers the question; a named grouping
+        # ("by education") pulls every summary of that grouping
+        doc_filter, whole_grouping = summary_filter(query)
+        top_k = plan.max_top_k if whole_grouping else plan.initial_top_k
+        matches = run(top_k, doc_filter=doc_filter)
+        if matches:
+            return RetrievalResult(RecordSet.from_matches(matches), top_k, 1, doc_filter, "aggregate")
+        # Index built before summaries existed: answer from the rows instead
+        plan = QueryPlan("ranking", plan.sort_type)
+
+    top_k = plan.initial_top_k
+    metadata_filter = None
+    farmer_ids = sorted({m.lower() for m in FARMER_ID_PATTERN.findall(query)})
+    if plan.query_class == "lookup" and farmer_ids:
+        # A named farm is fetched by its id, wherever it sits in the embedding space
+        metadata_filter = {"farmer": {"$in": farmer_ids}}
+    matches = run(top_k, metadata_filter)
+    if not matches and metadata_filter:
+        metadata_filter = None  # ids the index doesn't know: fall back to similarity
+        matches = run(top_k)
+    pages = 1
+    # Every row matching a derived filter is wanted, so such queries page until exhausted
+    exhaustive = False
+
+    if plan.query_class in ("listing", "ranking"):
+        metadata_filter = derive_filter(query, RecordSet.from_matches(matches))
+        exhaustive = metadata_filter is not None
+        count = estimate_count(index, combine_filters(ROW_FILTER if typed[0] else None, metadata_filter), namespace)
+        if count is None and metadata_filter is None:
+            # Filtered stats unsupported: the unfiltered total is a close upper bound
+            count = estimate_count(index, namespace=namespace)
+        if count is not None:
+            top_k = min(max(count, 1), plan.max_top_k)
+            if top_k > len(matches) or metadata_filter:
+                matches = run(top_k, metadata_filter)
+                pages += 1
+            return RetrievalResult(RecordSet.from_matches(matches), top_k, pages, metadata_filter, plan.query_class)
+        if metadata_filter:
+            matches = run(top_k, metadata_filter)
+            pages += 1
+
+    elif hierarchical and typed[0] and plan.query_class in HIERARCHICAL_CLASSES:
+        # Level one: best area documents; level two: rows inside those areas only
+        groups = run(HIERARCHICAL_GROUPS, doc_filter=GROUP_FILTER)
+        group_ids = [g['metadata']['group_id'] for g in groups if g.get('metadata')]
+        # No area documents means an index built before they existed: keep the flat result
+        if group_ids:
+            metadata_filter = {"group_id": {"$in": group_ids}}
+            matches = run(top_k, metadata_filter)
+            pages += 1
+
+    # Expand in doubling pages until the result looks complete
+    min_drop = float("inf") if exhaustive else 0.08
+    while top_k < plan.max_top_k and not is_sufficient(matches, top_k, min_drop):
+        top_k = min(top_k * 2, plan.max_top_k)
+        matches = run(top_k, metadata_filter)
+        pages += 1
+    return RetrievalResult(RecordSet.from_matches(matches), top_k, pages, metadata_filter, plan.query_class)
@@ -0,0 +1,111 @@
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+from local_index import LocalIndex
+
+EMBED_DIMENSION = 256
+
+
+# -------------------------------
+# Function: Deterministic stand-in embedding
+# -------------------------------
+def hash_embedding(text, dimension=EMBED_DIMENSION):
+    """
+    Hashed bag-of-words vector: texts sharing words get similar vectors, so
+    retrieval over it behaves plausibly without calling Cohere.
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for token in re.findall(r"[a-z0-9_]+", text.lower()):
+        h = zlib.crc32(token.encode())
+        vector[h % dimension] += 1.0 if (h >> 16) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class LatencyModel:
+    """Log-normal latency given its median and p95, in seconds, optionally scaled."""
+
+    def __init__(self, median, p95, scale=1.0):
+        self.mu = math.log(median)
+        self.sigma = math.log(p95 / median) / 1.645
+        self.scale = scale
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def sample(self):
+        with self._lock:
+            return self._random.lognormvariate(self.mu, self.sigma) * self.scale
+
+    def sleep(self, extra=0.0):
+        time.sleep(self.sample() + extra * self.scale)
+
+
+# -------------------------------
+# Simulated Cohere client
+# -------------------------------
+class SimulatedCohere:
+    """
+    Answers co.embed and co.chat like the Cohere client (same response shape)
+    after a realistic delay. Chat latency grows with the prompt length.
+    """
+
+    def __init__(self, embed_latency=None, chat_latency=None, seconds_per_1k_prompt_tokens=0.15,
+                 dimension=EMBED_DIMENSION, scale=1.0):
+        self.embed_latency = embed_latency or LatencyModel(0.12, 0.35, scale)
+        self.chat_latency = chat_latency or LatencyModel(1.5, 4.0, scale)
+        self.seconds_per_1k_prompt_tokens = seconds_per_1k_prompt_tokens
+        self.dimension = dimension
+
+    def embed(self, texts, model=None, input_type=None, embedding_types=None, **kwargs):
+        self.embed_latency.sleep()
+        vectors = [hash_embedding(t, self.dimension).tolist() for t in texts]
+        return SimpleNamespace(embeddings=SimpleNamespace(float=vectors))
+
+    def chat(self, message, model=None, temperature=None, chat_history=None, **kwargs):
+        prompt_tokens = len(message) / 4
+        self.chat_latency.sleep(extra=prompt_tokens / 1000 * self.seconds_per_1k_prompt_tokens)
+        lines = message.count("\n")
+        return SimpleNamespace(text=f"Simulated answer based on a {lines}-line prompt.")
+
+
+class SimulatedIndex:
+    """Wraps a LocalIndex and delays every call like a remote Pinecone index."""
+
+    def __init__(self, index, query_latency=None, scale=1.0):
+        self.index = index
+        self.query_latency = query_latency or LatencyModel(0.06, 0.2, scale)
+
+    def query(self, *args, **kwargs):
+        self.query_latency.sleep()
+        return self.index.query(*args, **kwargs)
+
+    def describe_index_stats(self, *args, **kwargs):
+        self.query_latency.sleep()
+        return self.index.describe_index_stats(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+# -------------------------------
+# Function: Build a local index from a CSV with stand-in embeddings
+# -------------------------------
+def build_simulated_index(csv_path="corn_data.csv", dimension=EMBED_DIMENSION):
+    """Runs the real document building from csv_ingest.py and indexes hash embeddings."""
+    from csv_ingest import build_documents, read_rows
+
+    documents = build_documents(read_rows(csv_path))
+    index = LocalIndex(dimension)
+    index.bulk_load(
+        [d[0] for d in documents],
+        np.stack([hash_embedding(d[1], dimension) for d in documents]),
+        [d[2] for d in documents],
+    )
+    return index
@@ -0,0 +1,50 @@
+import re
+import threading
+from concurrent.futures import Future
+
+
+def normalize_query(query):
+    """Case, whitespace and trailing punctuation don't change the answer."""
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip("?.! ")
+
+
+# -------------------------------
+# Single-flight: coalesce identical in-flight calls
+# -------------------------------
+class SingleFlight:
+    """
+    Process-wide request coalescing. The first caller for a key runs the function;
+    callers arriving with the same key while it is running wait for and share its
+    result (or exception). Nothing is cached once the call has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Returns (result, shared) where shared is True if another caller did the work."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.shared += 1
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = future
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result(), False
@@ -0,0 +1,109 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import CancelledError, TimeoutError
+
+from single_flight import normalize_query
+
+DEBOUNCE_SECONDS = 0.4
+MAX_CACHED = 8
+
+
+# -------------------------------
+# Speculative retrieval while the question is being typed
+# -------------------------------
+class Speculator:
+    """
+    Runs the embed/retrieve part of answering ahead of time for the text in the
+    question box. update() is called whenever the text changes; once it has been
+    stable for `debounce` seconds, compute(query, cancelled, **kwargs) runs on the
+    shared executor and its result is cached. A newer text cancels the pending
+    timer and marks running work stale (compute checks cancelled() between its
+    stages; a stale result is dropped). take() hands the cached or in-flight result
+    to the Search click, which then only has to generate.
+    """
+
+    def __init__(self, executor, compute, debounce=DEBOUNCE_SECONDS, max_cached=MAX_CACHED):
+        self.executor = executor
+        self.compute = compute
+        self.debounce = debounce
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._current_key = None
+        self._timer = None
+        self._in_flight = {}
+        self._cache = OrderedDict()
+        self.started = 0
+        self.cancelled = 0
+        self.hits = 0
+
+    def update(self, query, context=None, **kwargs):
+        """The question box now holds `query`; context (e.g. the data version) is part of the cache key."""
+        key = (normalize_query(query), context)
+        with self._lock:
+            if key == self._current_key:
+                return
+            self._current_key = key
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not key[0] or key in self._cache or key in self._in_flight:
+                return
+            self._timer = threading.Timer(self.debounce, self._start, (key, query, self._generation, kwargs))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _start(self, key, query, generation, kwargs):
+        with self._lock:
+            if generation != self._generation:
+                return  # the text changed during the debounce interval
+            self._timer = None
+            self.started += 1
+            future = self.executor.submit(self._run, key, query, generation, kwargs)
+            self._in_flight[key] = future
+
+    def _run(self, key, query, generation, kwargs):
+        def cancelled():
+            return generation != self._generation
+
+        try:
+            result = self.compute(query, cancelled, **kwargs)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        with self._lock:
+            if result is None or cancelled():
+                self.cancelled += 1
+                return None
+            self._cache[key] = result
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return result
+
+    def take(self, query, context=None, timeout=None):
+        """
+        Result prepared for `query`, waiting for it if it is still running; None when
+        nothing was speculated (or it failed), so the caller computes it normally.
+        """
+        key = (normalize_query(query), context)
+        with self._lock:
+            if self._timer is not None and key == self._current_key:
+                # Still debouncing: the caller is about to compute it anyway
+                self._timer.cancel()
+                self._timer = None
+            if key in self._cache:
+                self.hits += 1
+                return self._cache.pop(key)
+            future = self._in_flight.get(key)
+        if future is None:
+            return None
+        try:
+            result = future.result(timeout=timeout)
+        except (CancelledError, TimeoutError, Exception):
+            return None
+        with self._lock:
+            self._cache.pop(key, None)
+            if result is not None:
+                self.hits += 1
+        return result
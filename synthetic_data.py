@@ -0,0 +1,150 @@
+import argparse
+import math
+import sys
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = "corn_data.csv"
+
+# Numeric columns sampled jointly (Gaussian copula) so their correlations carry over
+NUMERIC_COLUMNS = ["Acreage", "Fertilizer amount", "Yield", "Laborers", "Household size"]
+COORDINATE_COLUMNS = ["Latitude", "Longitude"]
+CHUNK_ROWS = 50_000
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+
+def _normal_cdf(z):
+    return 0.5 * (1 + _erf(z / math.sqrt(2)).astype(float))
+
+
+def _normal_scores(values):
+    """Ranks mapped to standard-normal quantiles (ties averaged)."""
+    ranks = pd.Series(values).rank(method="average").to_numpy()
+    inv = NormalDist().inv_cdf
+    return np.array([inv(r / (len(values) + 1)) for r in ranks])
+
+
+# -------------------------------
+# Model fitted from the real CSV
+# -------------------------------
+class FarmModel:
+    """
+    Sampling model fitted to a source CSV:
+    - categorical columns are drawn together from real rows (keeps their joint mix)
+    - numeric columns use a Gaussian copula: correlated normals mapped back through
+      each column's empirical quantiles, so values stay on the real value grid
+    - missing numeric cells recur at the source's rate
+    - coordinates are a source farm's point plus Gaussian jitter (kernel density)
+    """
+
+    def __init__(self, csv_path=CSV_PATH):
+        df = pd.read_csv(csv_path)
+        self.columns = list(df.columns)
+        self.categorical = [c for c in self.columns
+                            if c not in NUMERIC_COLUMNS + COORDINATE_COLUMNS + ["Farmer"]]
+        self.profiles = df[self.categorical].astype(str).to_numpy()
+        self.integer_columns = [c for c in NUMERIC_COLUMNS if pd.api.types.is_integer_dtype(df[c])]
+
+        numeric = df[NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+        self.missing_rate = numeric.isna().mean().to_dict()
+        self.sorted_values = {c: np.sort(numeric[c].dropna().to_numpy()) for c in NUMERIC_COLUMNS}
+        # Correlation of normal scores over rows with every value present
+        complete = numeric.dropna()
+        scores = np.column_stack([_normal_scores(complete[c].to_numpy()) for c in NUMERIC_COLUMNS])
+        self.correlation = np.corrcoef(scores, rowvar=False)
+
+        self.coordinates = df[COORDINATE_COLUMNS].to_numpy(dtype=float)
+        # Scott's rule bandwidth per axis
+        self.bandwidth = self.coordinates.std(axis=0) * len(df) ** (-1 / 6)
+
+    def sample(self, rng, n, start_id=0, extra_counties=0):
+        """Returns a DataFrame of n synthetic rows in the source column order."""
+        out = {}
+        profiles = self.profiles[rng.integers(len(self.profiles), size=n)]
+        for j, column in enumerate(self.categorical):
+            out[column] = profiles[:, j]
+
+        # Correlated normals -> uniform -> empirical quantiles
+        z = rng.multivariate_normal(np.zeros(len(NUMERIC_COLUMNS)), self.correlation, size=n)
+        u = _normal_cdf(z)
+        for j, column in enumerate(NUMERIC_COLUMNS):
+            values = self.sorted_values[column]
+            idx = np.minimum((u[:, j] * len(values)).astype(int), len(values) - 1)
+            sampled = values[idx]
+            if column in self.integer_columns:
+                sampled = sampled.astype(np.int64).astype(object)
+            else:
+                sampled = sampled.astype(object)
+            missing = rng.random(n) < self.missing_rate[column]
+            sampled[missing] = ""
+            out[column] = sampled
+
+        # Coordinates: jitter around a real farm; synthetic counties reuse the spatial
+        # spread of the real data around a shifted centre
+        picks = rng.integers(len(self.coordinates), size=n)
+        coords = self.coordinates[picks] + rng.normal(size=(n, 2)) * self.bandwidth
+        if extra_counties:
+            county_no = rng.integers(extra_counties + 1, size=n)
+            shifted = county_no > 0
+            coords[shifted, 0] += 0.5 * county_no[shifted]
+            coords[shifted, 1] += 0.5 * county_no[shifted]
+            counties = np.where(shifted, np.char.add("SYNTHETIC ", county_no.astype(str)), out["County"])
+            out["County"] = counties
+        out["Latitude"] = np.round(coords[:, 0], 2)
+        out["Longitude"] = np.round(coords[:, 1], 2)
+
+        out["Farmer"] = np.char.add("fmr_", np.arange(start_id, start_id + n).astype(str))
+        return pd.DataFrame(out)[self.columns]
+
+
+# -------------------------------
+# Function: Stream synthetic rows as CSV
+# -------------------------------
+def generate(out, rows, model, seed=0, chunk_rows=CHUNK_ROWS, extra_counties=0, progress=None):
+    """
+    Writes a header plus `rows` synthetic rows to the text stream `out`, one chunk at
+    a time so memory stays flat at any size. Output is deterministic for a seed.
+    """
+    rng = np.random.default_rng(seed)
+    written = 0
+    while written < rows:
+        n = min(chunk_rows, rows - written)
+        chunk = model.sample(rng, n, start_id=written, extra_counties=extra_counties)
+        chunk.to_csv(out, header=(written == 0), index=False)
+        written += n
+        if progress:
+            progress(written)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic corn dataset with the real schema and statistics")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--source", default=CSV_PATH, help="real CSV the model is fitted to")
+    parser.add_argument("--out", default="-", help="output CSV path ('-' for stdout)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--counties", type=int, default=0,
+                        help="add this many synthetic counties (shifted copies of the real spatial spread)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    model = FarmModel(args.source)
+    start = time.perf_counter()
+
+    def progress(done):
+        rate = done / (time.perf_counter() - start)
+        print(f"{done:,}/{args.rows:,} rows ({rate:,.0f} rows/s)", file=sys.stderr)
+
+    if args.out == "-":
+        generate(sys.stdout, args.rows, model, args.seed, args.chunk_rows, args.counties, progress)
+    else:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            generate(f, args.rows, model, args.seed, args.chunk_rows, args.counties, progress)
+
+
+if __name__ == "__main__":
+    main()
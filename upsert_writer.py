@@ -0,0 +1,136 @@
+import json
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Pinecone rejects upsert requests above 2 MB; stay a little under it
+MAX_REQUEST_BYTES = 2 * 1024 * 1024 - 64 * 1024
+MAX_VECTORS_PER_REQUEST = 100
+
+
+# -------------------------------
+# Function: Split vectors into request-sized chunks
+# -------------------------------
+def chunk_vectors(vectors, max_vectors=MAX_VECTORS_PER_REQUEST, max_bytes=MAX_REQUEST_BYTES):
+    """
+    Groups vectors so that each chunk stays under both the vector count and the
+    serialized byte size limit. A single vector larger than max_bytes is sent alone.
+    """
+    for chunk, _ in _sized_chunks(vectors, max_vectors, max_bytes):
+        yield chunk
+
+
+def _sized_chunks(vectors, max_vectors, max_bytes):
+    """chunk_vectors, also yielding each chunk's serialized size in bytes."""
+    chunk, chunk_bytes = [], 0
+    for vector in vectors:
+        size = len(json.dumps(vector, separators=(",", ":")))
+        if chunk and (len(chunk) >= max_vectors or chunk_bytes + size > max_bytes):
+            yield chunk, chunk_bytes
+            chunk, chunk_bytes = [], 0
+        chunk.append(vector)
+        chunk_bytes += size
+    if chunk:
+        yield chunk, chunk_bytes
+
+
+class UpsertReport:
+    """Outcome of one UpsertWriter.write call."""
+
+    def __init__(self):
+        self.rows = 0
+        self.chunks = 0
+        self.retries = 0
+        self.failed_ids = []
+        self.elapsed = 0.0
+        self.bytes_sent = 0
+        self.chunk_seconds = []  # request latency per successful chunk, including retries
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (
+            f"Upserted {self.rows} vectors in {self.chunks} chunks "
+            f"({self.rows_per_second:,.0f} rows/sec, {self.retries} retries, "
+            f"{len(self.failed_ids)} failed)"
+        )
+
+
+# -------------------------------
+# Upsert writer: chunked, concurrent, retrying
+# -------------------------------
+class UpsertWriter:
+    """
+    Upserts vectors in size-bounded chunks over a bounded thread pool, retrying
+    each failed chunk with exponential backoff.
+    """
+
+    def __init__(self, index, max_vectors=MAX_VECTORS_PER_REQUEST, max_bytes=MAX_REQUEST_BYTES,
+                 max_workers=4, max_retries=5, backoff_seconds=1.0, namespace=None):
+        self.index = index
+        self.max_vectors = max_vectors
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.namespace = namespace
+
+    def _upsert_chunk(self, chunk):
+        """Send one chunk; returns (retries it needed, seconds taken)."""
+        kwargs = {"namespace": self.namespace} if self.namespace else {}
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(vectors=chunk, **kwargs)
+                return attempt, time.perf_counter() - start
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                # Exponential backoff with jitter so parallel chunks don't retry in lockstep
+                time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+
+    def write(self, vectors, progress=None):
+        """
+        Upserts every vector (any iterable, consumed lazily) and returns an UpsertReport.
+        progress, if given, is called with the report after each finished chunk.
+        Raises RuntimeError listing the failed ids once all other chunks are done.
+        """
+        report = UpsertReport()
+        start = time.perf_counter()
+        chunks = _sized_chunks(vectors, self.max_vectors, self.max_bytes)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {}
+            # Keep at most two chunks per worker in flight so large inputs aren't materialized
+            max_in_flight = self.max_workers * 2
+            for chunk, size in chunks:
+                pending[pool.submit(self._upsert_chunk, chunk)] = (chunk, size)
+                if len(pending) >= max_in_flight:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    self._collect(done, pending, report, start, progress)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                self._collect(done, pending, report, start, progress)
+
+        report.elapsed = time.perf_counter() - start
+        if report.failed_ids:
+            raise RuntimeError(f"{len(report.failed_ids)} vectors failed to upsert: {report.failed_ids[:10]}")
+        return report
+
+    def _collect(self, done, pending, report, start, progress):
+        for future in done:
+            chunk, size = pending.pop(future)
+            try:
+                retries, seconds = future.result()
+                report.retries += retries
+                report.rows += len(chunk)
+                report.chunks += 1
+                report.bytes_sent += size
+                report.chunk_seconds.append(seconds)
+            except Exception:
+                report.failed_ids.extend(v["id"] for v in chunk)
+            report.elapsed = time.perf_counter() - start
+            if progress:
+                progress(report)
@@ -0,0 +1,26 @@
+import os
+
+from data_versions import CURRENT_POINTER
+from index_snapshot import load_local_index
+
+
+# -------------------------------
+# Function: Open the configured vector index
+# -------------------------------
+def open_index():
+    """
+    Returns the index the app should query. VECTOR_BACKEND=local serves a snapshot
+    (LOCAL_INDEX_SNAPSHOT, made with `python index_snapshot.py export`) from memory;
+    anything else connects to the Pinecone index named by PINECONE_INDEX_NAME.
+    """
+    if os.getenv("VECTOR_BACKEND", "pinecone") == "local":
+        snapshot_dir = os.getenv("LOCAL_INDEX_SNAPSHOT", "snapshots/latest")
+        # Without a data version pointer (a checkout where `index_snapshot.py import` hasn't
+        # run) the app queries the default namespace, so serve the snapshot from there
+        namespace = None if os.path.exists(CURRENT_POINTER) else ""
+        return load_local_index(snapshot_dir, namespace=namespace)
+
+    from pinecone import Pinecone
+
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    return pc.Index(os.getenv("PINECONE_INDEX_NAME"))